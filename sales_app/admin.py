@@ -1,49 +1,172 @@
+from datetime import datetime, timedelta
 from django.contrib import admin
 
 # Register your models here.
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Max, Min, QuerySet
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from .models import (
     User, Role, Permission, Customer, Product, Invoice, InvoiceProduct
 )
+from .pagination import EstimatedCountPaginator
+from .search import search_filter
+from .stock import live_quantity
 
-class CustomUserAdmin(UserAdmin):
+class LargeTableAdminMixin:
+    """
+    Changelists of the tables that grow with the business: exact counts only
+    up to EstimatedCountPaginator.exact_count_limit, and no second COUNT(*)
+    over the whole table for the "N total" link.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class DateHierarchyQuerySet(QuerySet):
+    """
+    datetimes() for the date_hierarchy drill-down: one indexed EXISTS per
+    year / month / day between the first and the last row, instead of a
+    DISTINCT over the truncated date of every row (a Python call per row on
+    SQLite). Falls back to the DISTINCT past max_periods candidates.
+    """
+    max_periods = 400
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds['first'] is None:
+            return []
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        first, last = (
+            timezone.make_naive(bounds[end], tzinfo) if timezone.is_aware(bounds[end]) else bounds[end]
+            for end in ('first', 'last')
+        )
+
+        periods = [datetime(first.year, first.month if kind != 'year' else 1, first.day if kind == 'day' else 1)]
+        while len(periods) <= self.max_periods:
+            start = periods[-1]
+            if kind == 'year':
+                periods.append(start.replace(year=start.year + 1))
+            elif kind == 'month':
+                periods.append(start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1))
+            else:
+                periods.append(start + timedelta(days=1))
+            if periods[-1] > last:
+                break
+        else:
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        if timezone.is_aware(bounds['first']):
+            periods = [timezone.make_aware(start, tzinfo) for start in periods]
+        found = [
+            start for start, end in zip(periods, periods[1:])
+            if self.filter(**{f'{field_name}__gte': start, f'{field_name}__lt': end}).exists()
+        ]
+        return found if order == 'ASC' else found[::-1]
+
+class CustomUserAdmin(LargeTableAdminMixin, UserAdmin):
     model = User
-    
+
     list_display = ('email', 'username', 'name', 'role', 'status', 'is_staff')
+    list_select_related = ('role',)
     search_fields = ('email', 'username', 'name')
+    autocomplete_fields = ('role', 'created_by', 'updated_by')
     fieldsets = UserAdmin.fieldsets + (
 
         ('Custom Fields', {'fields': ('name', 'role', 'status', 'created_by', 'updated_by')}),
     )
 
+class SearchIndexAdminMixin:
+    """search_fields lookups through the search index (sales_app.search) instead of icontains scans."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_filter(queryset, search_term), False
+
 class InvoiceProductInline(admin.TabularInline):
     model = InvoiceProduct
+    fields = ('product', 'quantity', 'amount')
+    autocomplete_fields = ('product',)
     extra = 1
+    # the formset renders every line; past this many the invoice page links
+    # to the paginated line item changelist instead (InvoiceAdmin.get_inlines)
+    max_lines = 50
 
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'parent_role', 'status')
+    list_select_related = ('parent_role',)
     search_fields = ('name',)
 
 @admin.register(Permission)
 class PermissionAdmin(admin.ModelAdmin):
     list_display = ('role', 'model_name', 'create', 'read', 'update', 'delete')
+    list_select_related = ('role',)
     list_filter = ('role', 'model_name')
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdminMixin, SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'mobile')
     search_fields = ('name', 'email', 'mobile')
+    ordering = ('-created_at', '-id')
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'quantity')
+class ProductAdmin(LargeTableAdminMixin, SearchIndexAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'price', 'stock')
     search_fields = ('name',)
+    ordering = ('-created_at', '-id')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(live_quantity=live_quantity())
+
+    @admin.display(description='Quantity', ordering='live_quantity')
+    def stock(self, obj):
+        return obj.live_quantity
 
 @admin.register(Invoice)
-class InvoiceAdmin(admin.ModelAdmin):
+class InvoiceAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'customer', 'invoice_date', 'total_amount', 'status')
     list_filter = ('status', 'invoice_date')
-    inlines = [InvoiceProductInline] 
+    list_select_related = ('customer',)
+    search_fields = ('=id',)
+    autocomplete_fields = ('customer', 'created_by', 'updated_by')
+    readonly_fields = ('owner_role', 'line_items')
+    # both walk invoice_created_idx (invoice_status_created_idx with a status)
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at', '-id')
+    inlines = [InvoiceProductInline]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DateHierarchyQuerySet(queryset.model, queryset.query, queryset.db)
+
+    def line_count(self, obj):
+        if obj is None or obj.pk is None:
+            return 0
+        if not hasattr(obj, '_admin_line_count'):
+            obj._admin_line_count = obj.items.count()
+        return obj._admin_line_count
+
+    def get_inlines(self, request, obj):
+        if self.line_count(obj) > InvoiceProductInline.max_lines:
+            return []
+        return self.inlines
+
+    @admin.display(description='Line items')
+    def line_items(self, obj):
+        if obj is None or obj.pk is None:
+            return '-'
+        url = reverse('admin:sales_app_invoiceproduct_changelist')
+        return format_html('<a href="{}?invoice__id__exact={}">{} line items</a>', url, obj.pk, self.line_count(obj))
+
+@admin.register(InvoiceProduct)
+class InvoiceProductAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'invoice', 'product', 'quantity', 'amount')
+    list_select_related = ('invoice', 'product')
+    autocomplete_fields = ('invoice', 'product', 'created_by', 'updated_by')
+    readonly_fields = ('owner_role',)
 
-admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(User, CustomUserAdmin)
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class SalesAppConfig(AppConfig):
     name = 'sales_app'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
+        from .search import repair_search_indexes
+        post_migrate.connect(repair_search_indexes, sender=self)
@@ -0,0 +1,83 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.response import Response
+from .views import CustomerViewSet, ProductViewSet, InvoiceViewSet
+
+
+class AsyncReadView(View):
+    """
+    Async list / retrieve for a BaseSalesViewSet, served under ASGI without
+    holding a worker thread for the ORM round-trip.
+
+    Authentication, the permission checks and the scoped queryset are the
+    viewset's own, run in one sync_to_async hop (they hit the DB only when a
+    cache is cold). The rows are then read with the async ORM (aiterator /
+    aget) and serialized on the event loop: the query plan of the serializer
+    already loaded everything it reads.
+    """
+    viewset_class = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def start(self, request, action, kwargs):
+        viewset = self.viewset_class()
+        viewset.action_map = {'get': action}
+        viewset.args, viewset.kwargs = (), kwargs
+        viewset.request = viewset.initialize_request(request)
+        viewset.headers = viewset.default_response_headers
+        try:
+            viewset.initial(viewset.request)
+            return viewset, viewset.filter_queryset(viewset.get_queryset()), None
+        except Exception as exc:
+            return viewset, None, viewset.handle_exception(exc)
+
+    async def get(self, request, **kwargs):
+        action = 'retrieve' if 'pk' in kwargs else 'list'
+        viewset, queryset, response = await sync_to_async(self.start)(request, action, kwargs)
+        if response is None:
+            try:
+                if action == 'list':
+                    response = await self.alist(viewset, queryset)
+                else:
+                    response = await self.aretrieve(viewset, queryset, kwargs['pk'])
+            except Exception as exc:
+                response = viewset.handle_exception(exc)
+        return viewset.finalize_response(viewset.request, response)
+
+    async def alist(self, viewset, queryset):
+        paginator = viewset.paginator
+        if paginator is None:
+            rows = [row async for row in queryset.aiterator(chunk_size=2000)]
+            return Response(viewset.get_serializer(rows, many=True).data)
+        if hasattr(paginator, 'apaginate_queryset'):
+            page = await paginator.apaginate_queryset(queryset, viewset.request, view=viewset)
+        else:
+            page = await sync_to_async(paginator.paginate_queryset)(queryset, viewset.request, view=viewset)
+        return paginator.get_paginated_response(viewset.get_serializer(page, many=True).data)
+
+    async def aretrieve(self, viewset, queryset, pk):
+        try:
+            obj = await queryset.aget(**{viewset.lookup_field: pk})
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+        # set lookups in the request's AuthContext, built during start()
+        viewset.check_object_permissions(viewset.request, obj)
+        return Response(viewset.get_serializer(obj).data)
+
+
+class AsyncProductView(AsyncReadView):
+    viewset_class = ProductViewSet
+
+
+class AsyncCustomerView(AsyncReadView):
+    viewset_class = CustomerViewSet
+
+
+class AsyncInvoiceView(AsyncReadView):
+    viewset_class = InvoiceViewSet
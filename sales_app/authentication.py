@@ -0,0 +1,125 @@
+import copy
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .cache import get_version, invalidate
+from .permissions import build_permission_claims, role_version
+
+USER_VERSION_KEY = 'sales_app:auth_user:{}'
+
+
+def invalidate_user(user_id):
+    invalidate(USER_VERSION_KEY.format(user_id))
+
+
+class UserCache:
+    """
+    Process-wide LRU of authenticated users (with their role) by user id,
+    holding at most SALES_AUTH_USER_CACHE_SIZE entries.
+
+    An entry is served only while the user's version token and the role's
+    role_version are the ones it was loaded under; saving or deleting the
+    User or the Role bumps them (see signals). queryset.update() on users
+    bypasses the signals, so callers of it must call invalidate_user().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id, load):
+        key = str(user_id)
+        # read before loading: a change committed meanwhile leaves the entry stale
+        user_version = get_version(USER_VERSION_KEY.format(key))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            user, loaded_user_version, loaded_role_version = entry
+            if loaded_user_version == user_version and loaded_role_version == self.role_version(user):
+                return user
+
+        user = load(user_id)
+        entry = (user, user_version, self.role_version(user))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.SALES_AUTH_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+        return user
+
+    def role_version(self, user):
+        return role_version(user.role_id) if user.role_id else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that takes the user, with its role already loaded, from
+    user_cache instead of loading it on every request. Users whose status is
+    off are rejected like inactive ones.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = user_cache.get(user_id, self.load_user)
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if (api_settings.CHECK_USER_IS_ACTIVE and not user.is_active) or not user.status:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        # each request gets its own instance; the cached one is never mutated
+        return copy.copy(user)
+
+    def load_user(self, user_id):
+        return self.user_model.objects.select_related('role').get(**{api_settings.USER_ID_FIELD: user_id})
+
+
+class PermissionClaimsRefreshToken(RefreshToken):
+    """
+    RefreshToken whose access tokens carry build_permission_claims() of the
+    user as of their issue, when SALES_JWT_PERMISSION_CLAIMS is on. The
+    refresh token itself carries none, so a refresh signs the current role
+    and permissions instead of copying the ones from login.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token._user = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        if settings.SALES_JWT_PERMISSION_CLAIMS:
+            user = getattr(self, '_user', None)
+            if user is None:
+                user = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]})
+            for claim, value in build_permission_claims(user).items():
+                access[claim] = value
+        return access
@@ -0,0 +1,54 @@
+import time
+import uuid
+from django.conf import settings
+from django.db import transaction
+from .models import VersionToken
+
+
+# ---------------------------------------------------------
+# Version tokens (shared invalidation between processes)
+# ---------------------------------------------------------
+# Every process keeps its own compiled copy of slow-changing data and compares
+# a version token before using it. The tokens live in the database
+# (VersionToken), so a change made in one worker reaches every worker, and
+# each process re-reads a token at most every SALES_VERSION_TOKEN_TTL
+# seconds: that is how long another worker may keep serving what it compiled
+# before a revocation. Tokens are random rather than counters so a token a
+# process already saw can never come back.
+
+_seen = {}  # key: (version, monotonic time it was read or set)
+
+
+def new_version():
+    return uuid.uuid4().hex
+
+
+def get_version(key):
+    now = time.monotonic()
+    seen = _seen.get(key)
+    if seen is not None and now - seen[1] < settings.SALES_VERSION_TOKEN_TTL:
+        return seen[0]
+    version = VersionToken.objects.filter(key=key).values_list('version', flat=True).first()
+    if version is None:
+        VersionToken.objects.bulk_create([VersionToken(key=key, version=new_version())], ignore_conflicts=True)
+        version = VersionToken.objects.filter(key=key).values_list('version', flat=True).first()
+    _seen[key] = (version, now)
+    return version
+
+
+def bump_version(key):
+    version = new_version()
+    if not VersionToken.objects.filter(key=key).update(version=version):
+        VersionToken.objects.bulk_create([VersionToken(key=key, version=version)], ignore_conflicts=True)
+    _seen[key] = (version, time.monotonic())
+
+
+def invalidate(key):
+    """
+    Bump the token in this process now and the shared one once the
+    surrounding transaction commits, so no process can cache rows that were
+    read before the commit under the new token. The shared bump runs outside
+    the transaction: writers do not queue on the token row until they commit.
+    """
+    _seen[key] = (new_version(), time.monotonic())
+    transaction.on_commit(lambda: bump_version(key))
@@ -0,0 +1,82 @@
+import hashlib
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+from .cache import get_version, invalidate
+
+CATALOG_VERSION_KEY = 'sales_app:catalog:{}'
+
+
+def invalidate_catalog(model):
+    """Drop the cached responses and validators of a catalog model (Product, Customer)."""
+    invalidate(CATALOG_VERSION_KEY.format(model._meta.model_name))
+
+
+class CatalogCacheMixin:
+    """
+    list / retrieve of a catalog that every user with read permission sees in
+    full (see BaseSalesViewSet.scope_queryset), so the serialized list can be
+    shared between users.
+
+    Responses carry an ETag derived from the catalog's version token; a
+    matching If-None-Match gets a 304 before anything is queried or
+    serialized. There is no Last-Modified: HTTP dates have one-second
+    resolution, so a write in the same second as the previous one would
+    leave If-Modified-Since answering 304 with stale stock.
+
+    List pages are cached per URL and version, so a write
+    (invalidate_catalog) retires them all at once. Authentication and
+    permission checks still run on every request.
+    """
+    catalog_cache_timeout = 300
+
+    def catalog_version(self):
+        return get_version(CATALOG_VERSION_KEY.format(self.queryset.model._meta.model_name))
+
+    def catalog_etag(self, request, version, resource):
+        digest = hashlib.md5(f'{version}|{resource}|{request.accepted_media_type}'.encode()).hexdigest()
+        return quote_etag(digest)
+
+    def conditional_response(self, request, etag):
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response = self.with_validators(response, etag)
+        return response
+
+    def with_validators(self, response, etag):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            # per-user permission checks: browsers may keep it, shared caches may not
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Authorization', 'Accept'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        version = self.catalog_version()
+        url = request.build_absolute_uri()
+        etag = self.catalog_etag(request, version, url)
+        not_modified = self.conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        key = f'{CATALOG_VERSION_KEY.format(self.queryset.model._meta.model_name)}:{version}:' \
+              f'{hashlib.md5(url.encode()).hexdigest()}'
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, self.catalog_cache_timeout)
+        else:
+            response = Response(data)
+        return self.with_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        # object permissions depend on the row, so it is always fetched
+        instance = self.get_object()
+        etag = self.catalog_etag(request, self.catalog_version(), instance.pk)
+        not_modified = self.conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        response = Response(self.get_serializer(instance).data)
+        return self.with_validators(response, etag)
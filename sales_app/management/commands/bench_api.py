@@ -0,0 +1,162 @@
+import json
+import platform
+import random
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from sales_app.models import User, Customer, Product, Invoice
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive login, list, retrieve and invoice-create through the Django test client "
+        "against the configured database (e.g. after seed_sales_data) and report "
+        "throughput, p50/p99 latency and queries per request. Invoice creates are "
+        "rolled back. --save writes a JSON baseline, --compare diffs against one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='employee1.0@seed.local', help="Email to log in as.")
+        parser.add_argument('--password', default='secret123')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--save', metavar='PATH', help="Write the results as a JSON baseline.")
+        parser.add_argument('--compare', metavar='PATH', help="Compare with a saved baseline.")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed p50 / throughput regression ratio.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.client = Client()
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f"No user {options['user']!r}; run seed_sales_data or pass --user.")
+
+        login = {'email': options['user'], 'password': options['password']}
+        response = self.client.post('/api/login/', login, content_type='application/json')
+        if response.status_code != 200:
+            raise CommandError(f"Login failed: {response.status_code} {response.content[:200]!r}")
+        self.headers = {'Authorization': f"Bearer {response.json()['access']}"}
+
+        invoice_ids = self.sample_ids('/api/invoices/?limit=200')
+        product_ids = list(Product.objects.filter(quantity__gte=100).values_list('id', flat=True)[:500])
+        customer_ids = list(Customer.objects.values_list('id', flat=True)[:500])
+        if not invoice_ids or not product_ids or not customer_ids:
+            raise CommandError("Need invoices, products and customers visible to the user; seed some data first.")
+
+        scenarios = {
+            'login': lambda: self.client.post('/api/login/', login, content_type='application/json'),
+            'list_invoices': lambda: self.get('/api/invoices/'),
+            'list_products': lambda: self.get('/api/products/'),
+            'list_customers': lambda: self.get('/api/customers/'),
+            'retrieve_invoice': lambda: self.get(f'/api/invoices/{self.rng.choice(invoice_ids)}/'),
+            'create_invoice': lambda: self.client.post('/api/invoices/', {
+                'customer_id': self.rng.choice(customer_ids),
+                'items': [
+                    {'product_id': product_id, 'quantity': self.rng.randint(1, 3)}
+                    for product_id in self.rng.sample(product_ids, self.rng.randint(1, 3))
+                ],
+            }, content_type='application/json', headers=self.headers),
+        }
+
+        results = {}
+        try:
+            with transaction.atomic():
+                for name, request in scenarios.items():
+                    results[name] = self.measure(request, options['iterations'], options['warmup'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.report(results)
+        baseline = {
+            'created_at': timezone.now().isoformat(),
+            'user': options['user'],
+            'iterations': options['iterations'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'invoices': Invoice.objects.count(),
+            'debug': settings.DEBUG,
+            'scenarios': results,
+        }
+        if options['save']:
+            with open(options['save'], 'w') as handle:
+                json.dump(baseline, handle, indent=2)
+            self.stdout.write(f"Baseline written to {options['save']}")
+        if options['compare']:
+            self.compare(results, options['compare'], options['tolerance'], options['fail_on_regression'])
+
+    def get(self, url):
+        return self.client.get(url, headers=self.headers)
+
+    def sample_ids(self, url):
+        response = self.get(url)
+        if response.status_code != 200:
+            raise CommandError(f"GET {url}: {response.status_code}")
+        return [row['id'] for row in response.json()['results']]
+
+    def measure(self, request, iterations, warmup):
+        for _ in range(warmup):
+            request()
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                began = time.perf_counter()
+                response = request()
+                latencies.append(time.perf_counter() - began)
+            queries.append(len(captured.captured_queries))
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'throughput': round(iterations / elapsed, 2),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p99_ms': round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 2),
+            'queries': round(statistics.mean(queries), 1),
+            'errors': errors,
+        }
+
+    def report(self, results):
+        self.stdout.write(f"{'scenario':<18}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'queries':>9}{'errors':>8}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<18}{result['throughput']:>10.1f}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                f"{result['queries']:>9.1f}{result['errors']:>8}"
+            )
+
+    def compare(self, results, path, tolerance, fail):
+        with open(path) as handle:
+            baseline = json.load(handle)['scenarios']
+
+        regressions = []
+        self.stdout.write(f"\nvs {path}")
+        self.stdout.write(f"{'scenario':<18}{'p50':>10}{'req/s':>10}{'queries':>10}")
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            p50 = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0
+            throughput = result['throughput'] / before['throughput'] - 1 if before['throughput'] else 0
+            queries = result['queries'] - before['queries']
+            line = f"{name:<18}{p50:>+10.1%}{throughput:>+10.1%}{queries:>+10.1f}"
+            if p50 > tolerance or throughput < -tolerance or queries > 0:
+                regressions.append(name)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if regressions and fail:
+            raise CommandError(f"Regressions: {', '.join(regressions)}")
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,130 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import RefreshToken
+from sales_app.models import User
+from sales_project.asgi import application as asgi_application
+from sales_project.wsgi import application as wsgi_application
+
+RESOURCES = ('products', 'customers', 'invoices')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read throughput of the WSGI application (a worker with --threads "
+        "threads) and the ASGI application (one event loop, --concurrency requests "
+        "in flight) on the list routes, with simulated database latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resource', choices=RESOURCES, default='invoices')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument('--concurrency', type=int, default=64, help="ASGI requests in flight.")
+        parser.add_argument('--db-latency-ms', type=float, default=20.0, help="Added to every query, as a remote database would.")
+        parser.add_argument('--user', help="Email of the user to authenticate as (default: first admin-role user).")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        self.token = f'Bearer {RefreshToken.for_user(user).access_token}'
+        self.add_latency(options['db_latency_ms'] / 1000)
+
+        resource, total = options['resource'], options['requests']
+        runs = [
+            ('wsgi', f"/api/{resource}/", lambda path: self.run_wsgi(path, total, options['threads'])),
+            ('asgi', f"/api/{resource}/", lambda path: asyncio.run(self.run_asgi(path, total, options['concurrency']))),
+            ('asgi', f"/api/async/{resource}/", lambda path: asyncio.run(self.run_asgi(path, total, options['concurrency']))),
+        ]
+        self.stdout.write(f"{total} requests as {user.email}, +{options['db_latency_ms']:.0f}ms per query\n")
+        self.stdout.write(f"{'server':<8}{'route':<26}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for server, path, run in runs:
+            started = time.perf_counter()
+            results = run(path)
+            elapsed = time.perf_counter() - started
+            latencies = sorted(latency for status, latency in results if status == 200)
+            errors = sum(1 for status, _ in results if status != 200)
+            p50 = statistics.median(latencies) * 1000 if latencies else 0
+            p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000 if latencies else 0
+            self.stdout.write(f"{server:<8}{path:<26}{len(results) / elapsed:>10.1f}{p50:>10.1f}{p99:>10.1f}{errors:>8}")
+
+    def get_user(self, email):
+        users = User.objects.filter(role__isnull=False).order_by('id')
+        user = users.filter(email=email).first() if email else (
+            users.filter(role__parent_role__isnull=True).first() or users.first()
+        )
+        if user is None:
+            raise CommandError("No matching user with a role; seed some data or pass --user.")
+        return user
+
+    def add_latency(self, seconds):
+        """Sleep before every query, on every connection (each thread opens its own)."""
+        if not seconds:
+            return
+
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+
+        def on_connection(sender, connection, **kwargs):
+            # a thread's DatabaseWrapper is reused across reconnects
+            if slow_execute not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_execute)
+
+        connection_created.connect(on_connection, weak=False)
+        connection.close()
+
+    def run_wsgi(self, path, total, threads):
+        def request(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'SERVER_NAME': 'testserver',
+                'HTTP_AUTHORIZATION': self.token, 'wsgi.input': io.BytesIO(),
+            }
+            setup_testing_defaults(environ)
+            status = []
+            started = time.perf_counter()
+            body = wsgi_application(environ, lambda code, headers: status.append(int(code.split()[0])))
+            b''.join(body)
+            body.close()
+            return status[0], time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(request, range(total)))
+
+    async def run_asgi(self, path, total, concurrency):
+        gate = asyncio.Semaphore(concurrency)
+
+        async def request():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '',
+                'headers': [(b'host', b'testserver'), (b'authorization', self.token.encode())],
+                'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+            }
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            finished = asyncio.Event()
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with gate:
+                started = time.perf_counter()
+                await asgi_application(scope, receive, send)
+                finished.set()
+                return status[0], time.perf_counter() - started
+
+        return await asyncio.gather(*(request() for _ in range(total)))
@@ -0,0 +1,60 @@
+import statistics
+import time
+from io import BytesIO
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.parsers import JSONParser
+from sales_app.models import Invoice
+from sales_app.optimization import optimize_queryset
+from sales_app.renderers import FastJSONRenderer, FastJSONParser, orjson
+from sales_app.serializers import InvoiceSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark DRF's JSONRenderer / JSONParser against sales_app.renderers "
+        "on real InvoiceSerializer output (one list page of invoices) and check the "
+        "rendered bytes are identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=50, help="Invoices per payload (a list page).")
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed: FastJSONRenderer falls back to DRF's renderer."))
+
+        serializer = InvoiceSerializer()
+        invoices = list(optimize_queryset(Invoice.objects.order_by('-created_at', '-id'), serializer)[:options['invoices']])
+        if not invoices:
+            raise CommandError("No invoices; run seed_sales_data first.")
+        data = {'next': None, 'results': InvoiceSerializer(invoices, many=True).data}
+
+        baseline = JSONRenderer().render(data)
+        fast = FastJSONRenderer().render(data)
+        if fast != baseline:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer.")
+        self.stdout.write(f"{len(invoices)} invoices, {len(baseline)} bytes, output identical\n")
+
+        iterations = options['iterations']
+        timings = {
+            'render drf': self.measure(lambda: JSONRenderer().render(data), iterations),
+            'render fast': self.measure(lambda: FastJSONRenderer().render(data), iterations),
+            'parse drf': self.measure(lambda: JSONParser().parse(BytesIO(baseline)), iterations),
+            'parse fast': self.measure(lambda: FastJSONParser().parse(BytesIO(baseline)), iterations),
+        }
+        self.stdout.write(f"{'':<14}{'p50 us':>10}{'MB/s':>10}")
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name:<14}{seconds * 1e6:>10.1f}{len(baseline) / seconds / 1e6:>10.1f}")
+        for kind in ('render', 'parse'):
+            self.stdout.write(f"{kind} speedup: {timings[f'{kind} drf'] / timings[f'{kind} fast']:.1f}x")
+
+    def measure(self, func, iterations):
+        func()
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples)
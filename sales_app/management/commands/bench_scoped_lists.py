@@ -0,0 +1,89 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class Command(BaseCommand):
+    help = (
+        "List latency of a role-scoped user (a sales manager) against table size: "
+        "the invoice page query with the old join-through-creator + DISTINCT scoping, "
+        "the owner_role scoping, and GET /api/invoices/ end to end. Each size is "
+        "seeded into its own temporary SQLite database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000', help="Invoice counts, comma separated.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--worker', type=int, help="Internal: seed and measure this size in this process.")
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(options['worker'], options['iterations'])))
+            return
+
+        self.stdout.write(f"{'invoices':>10}{'join+distinct ms':>18}{'owner_role ms':>15}{'api ms':>10}")
+        for size in [int(size) for size in options['sizes'].split(',')]:
+            result = self.run_size(size, options['iterations'])
+            self.stdout.write(
+                f"{size:>10}{result['join_ms']:>18.2f}{result['owner_role_ms']:>15.2f}{result['api_ms']:>10.2f}"
+            )
+
+    def run_size(self, size, iterations):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                SALES_DB_ENGINE='sqlite',
+                SALES_SQLITE_PATH=os.path.join(directory, 'bench.sqlite3'),
+            )
+            command = [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_scoped_lists',
+                '--worker', str(size), '--iterations', str(iterations),
+            ]
+            process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def run_worker(self, size, iterations):
+        from sales_app.models import User, Invoice, RoleClosure
+
+        call_command('migrate', verbosity=0)
+        call_command(
+            'seed_sales_data', invoices=size, customers=max(size // 10, 100), products=200,
+            users_per_role=2, stdout=StringIO()
+        )
+        user = User.objects.get(email='manager1.0@seed.local')
+        children = RoleClosure.objects.filter(ancestor_id=user.role_id, depth__gt=0).values('descendant_id')
+        page = lambda queryset: list(queryset.order_by('-created_at', '-id')[:51])
+
+        old = Invoice.objects.filter(Q(created_by=user) | Q(created_by__role_id__in=children)).distinct()
+        new = Invoice.objects.filter(Q(owner_role_id__in=children) | Q(created_by=user))
+        if [row.pk for row in page(old)] != [row.pk for row in page(new)]:
+            raise CommandError("The two scopings returned different pages.")
+
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        return {
+            'join_ms': self.measure(lambda: page(old), iterations),
+            'owner_role_ms': self.measure(lambda: page(new), iterations),
+            'api_ms': self.measure(lambda: Client().get('/api/invoices/', headers=headers), iterations),
+        }
+
+    def measure(self, func, iterations):
+        func()
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples) * 1000
@@ -0,0 +1,113 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+PROFILES = {
+    'default': '0',
+    'tuned': '1',  # SALES_SQLITE_TUNED
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure invoice write throughput on SQLite with N concurrent writers, "
+        "default connection settings vs SALES_SQLITE_TUNED=1. Each profile runs "
+        "in its own process against a fresh temporary database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--invoices', type=int, default=50, help="Invoices created by each writer.")
+        parser.add_argument('--worker', action='store_true', help="Internal: run one profile in this process.")
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(options['writers'], options['invoices'])))
+            return
+
+        self.stdout.write(f"{options['writers']} writers x {options['invoices']} invoices\n")
+        self.stdout.write(f"{'profile':<10}{'invoices/s':>12}{'created':>10}{'locked':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for profile, tuned in PROFILES.items():
+            result = self.run_profile(tuned, options['writers'], options['invoices'])
+            self.stdout.write(
+                f"{profile:<10}{result['throughput']:>12.1f}{result['created']:>10}{result['locked']:>10}"
+                f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+            )
+
+    def run_profile(self, tuned, writers, invoices):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                SALES_DB_ENGINE='sqlite',
+                SALES_SQLITE_PATH=os.path.join(directory, 'bench.sqlite3'),
+                SALES_SQLITE_TUNED=tuned,
+            )
+            command = [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_sqlite_writes', '--worker',
+                '--writers', str(writers), '--invoices', str(invoices),
+            ]
+            process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def run_worker(self, writers, invoices):
+        from sales_app.models import Role, User, Customer, Product
+        from sales_app.services import create_invoice
+
+        if connection.vendor != 'sqlite':
+            raise CommandError("bench_sqlite_writes only measures SQLite.")
+        call_command('migrate', verbosity=0)
+        role = Role.objects.create(name='Bench')
+        user = User.objects.create_user(username='bench', email='bench@bench.local', password='bench123', name='bench', role=role)
+        customer = Customer.objects.create(name='Bench', email='bench@bench.local', mobile='0')
+        product_ids = [
+            Product.objects.create(name=f'Bench {i}', price='1.00', quantity=10 ** 9).id
+            for i in range(10)
+        ]
+        connection.close()
+
+        barrier = threading.Barrier(writers)
+        latencies, locked = [], []
+
+        def writer(index):
+            try:
+                barrier.wait()
+                for n in range(invoices):
+                    first = product_ids[(index + n) % len(product_ids)]
+                    second = product_ids[(index + n + 1) % len(product_ids)]
+                    items = [{'product_id': first, 'quantity': 1}, {'product_id': second, 'quantity': 1}]
+                    started = time.perf_counter()
+                    try:
+                        create_invoice(customer, items, user)
+                        latencies.append(time.perf_counter() - started)
+                    except OperationalError:
+                        locked.append(index)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'created': len(latencies),
+            'locked': len(locked),
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+            'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+        }
@@ -0,0 +1,90 @@
+import statistics
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from sales_app.models import (
+    Role, User, Customer, Product, Invoice, StockMovement, DailySalesSummary, DailyCustomerSales, DailyProductSales
+)
+from sales_app.services import create_invoice
+from sales_app.stock import compact_product_stock, live_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent invoice creation for the same best-selling product, with its "
+        "stock in Product.quantity vs in StockShard counters. Runs against the "
+        "configured database (meaningful on PostgreSQL; SQLite serializes all "
+        "writers anyway) with its own fixtures, removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--invoices', type=int, default=50, help="Invoices created by each writer.")
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        role = Role.objects.create(name='Bench stock')
+        user = User.objects.create_user(
+            username='bench-stock', email='bench-stock@bench.local', password='bench123', name='bench', role=role
+        )
+        customer = Customer.objects.create(name='Bench stock', email='bench-stock@bench.local', mobile='bench-stock')
+        try:
+            self.stdout.write(f"{connection.vendor}: {options['writers']} writers x {options['invoices']} invoices\n")
+            self.stdout.write(f"{'stock':<10}{'invoices/s':>12}{'created':>10}{'errors':>10}{'p50 ms':>10}{'p99 ms':>10}  consistent")
+            for label, shards in (('row', 0), ('sharded', options['shards'])):
+                product = Product.objects.create(name=f'Bench stock {label}', price='1.00', quantity=10 ** 9)
+                if shards:
+                    compact_product_stock(product.pk, shards)
+                result = self.run(product, customer, user, options['writers'], options['invoices'])
+                self.stdout.write(
+                    f"{label:<10}{result['throughput']:>12.1f}{result['created']:>10}{result['errors']:>10}"
+                    f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}  {result['consistent']}"
+                )
+        finally:
+            Invoice.objects.filter(customer=customer).delete()
+            for summary in (DailySalesSummary, DailyCustomerSales, DailyProductSales):
+                summary.objects.filter(role=role).delete()
+            Product.objects.filter(name__startswith='Bench stock ').delete()
+            customer.delete()
+            user.delete()
+            role.delete()
+
+    def run(self, product, customer, user, writers, invoices):
+        connection.close()
+        barrier = threading.Barrier(writers)
+        latencies, errors = [], []
+
+        def writer():
+            try:
+                barrier.wait()
+                for _ in range(invoices):
+                    started = time.perf_counter()
+                    try:
+                        create_invoice(customer, [{'product_id': product.pk, 'quantity': 1}], user)
+                        latencies.append(time.perf_counter() - started)
+                    except (DatabaseError, ValueError):
+                        errors.append(1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        sold = -(StockMovement.objects.filter(product=product, reason='sale').aggregate(total=Sum('quantity'))['total'] or 0)
+        consistent = sold == len(latencies) and live_stock([product.pk])[product.pk] == 10 ** 9 - sold
+        latencies.sort()
+        return {
+            'created': len(latencies),
+            'errors': len(errors),
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+            'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+            'consistent': consistent,
+        }
@@ -0,0 +1,41 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+from sales_app.catalog import invalidate_catalog
+from sales_app.models import Product, StockMovement, StockShard
+from sales_app.stock import compact_product_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact sharded stock: write each sharded product's shard total to "
+        "Product.quantity and spread it evenly over its shards again. Run it "
+        "periodically (e.g. every minute from cron). --shard / --hot move "
+        "products onto SALES_STOCK_SHARDS counters, --unshard moves them back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', type=int, action='append', default=[], metavar='PRODUCT_ID')
+        parser.add_argument('--unshard', type=int, action='append', default=[], metavar='PRODUCT_ID')
+        parser.add_argument('--hot', type=int, default=0, help="Also shard the N best sellers of the last --hours.")
+        parser.add_argument('--hours', type=int, default=24)
+        parser.add_argument('--shards', type=int, default=settings.SALES_STOCK_SHARDS, help="Shards per sharded product.")
+
+    def handle(self, *args, **options):
+        targets = dict.fromkeys(StockShard.objects.values_list('product_id', flat=True).distinct())
+        to_shard = list(options['shard'])
+        if options['hot']:
+            since = timezone.now() - timedelta(hours=options['hours'])
+            # sale movements are negative: the most sold sort first
+            to_shard += StockMovement.objects.filter(reason='sale', created_at__gte=since).values('product_id') \
+                .annotate(sold=Sum('quantity')).order_by('sold').values_list('product_id', flat=True)[:options['hot']]
+        targets.update(dict.fromkeys(to_shard, options['shards']))
+        targets.update(dict.fromkeys(options['unshard'], 0))
+
+        for product_id in Product.objects.filter(id__in=targets).values_list('id', flat=True).order_by('id'):
+            total = compact_product_stock(product_id, targets[product_id])
+            self.stdout.write(f"product {product_id}: {total} in stock")
+        invalidate_catalog(Product)
+        self.stdout.write(self.style.SUCCESS(f"Compacted {len(targets)} products."))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh planner statistics (ANALYZE) and optionally reclaim space (VACUUM). "
+        "Meant to run periodically, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vacuum', action='store_true', help="Also VACUUM (SQLite rewrites the whole file and locks it meanwhile).")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            statements = [
+                # sample at most ~1000 rows per index, so ANALYZE stays cheap
+                # however large the tables grow
+                'PRAGMA analysis_limit=1000',
+                'ANALYZE',
+            ]
+            if options['vacuum']:
+                statements.append('VACUUM')
+            # fold the WAL back into the database file and truncate it
+            statements.append('PRAGMA wal_checkpoint(TRUNCATE)')
+        elif connection.vendor == 'postgresql':
+            statements = ['VACUUM ANALYZE' if options['vacuum'] else 'ANALYZE']
+        else:
+            statements = ['ANALYZE']
+
+        with connection.cursor() as cursor:
+            for statement in statements:
+                started = time.perf_counter()
+                cursor.execute(statement)
+                self.stdout.write(f"{statement}: {time.perf_counter() - started:.2f}s")
+        self.stdout.write(self.style.SUCCESS("Database maintenance done."))
@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+from sales_app.models import User
+from sales_app.reporting import REPORT_GROUPINGS
+from sales_app.search import SEARCH_FIELDS
+from sales_app.urls import router
+from sales_app.validators import CustomerValidator, ProductValidator, UserValidator, InvoiceValidator
+
+
+class QueryRecorder:
+    """connection.execute_wrapper that keeps every distinct SELECT (sql, params)."""
+
+    def __init__(self):
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the database EXPLAIN plan of every query the API endpoints and "
+        "validators run, so a missing or unused index shows up as a scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to run the requests as (default: first admin-role user).")
+        parser.add_argument('--only', action='append', default=[], help="Limit to these router prefixes, e.g. --only invoices.")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        client = APIClient()
+        client.force_authenticate(user)
+        self.stdout.write(f"Running as {user.email} on {connection.vendor}\n")
+
+        for prefix, viewset, basename in router.registry:
+            if options['only'] and prefix not in options['only']:
+                continue
+            if prefix == 'reports':
+                for group_by in REPORT_GROUPINGS:
+                    self.explain(f"GET /api/reports/?group_by={group_by}",
+                                 lambda: client.get('/api/reports/', {'group_by': group_by}))
+                continue
+
+            if viewset.queryset.model._meta.model_name in SEARCH_FIELDS:
+                self.explain(f"GET /api/{prefix}/?search=a", lambda: client.get(f'/api/{prefix}/', {'search': 'a'}))
+            response = self.explain(f"GET /api/{prefix}/", lambda: client.get(f'/api/{prefix}/'))
+            results = response.data.get('results', []) if response.status_code == 200 else []
+            if results and 'id' in results[0]:
+                pk = results[0]['id']
+                self.explain(f"GET /api/{prefix}/{pk}/", lambda: client.get(f'/api/{prefix}/{pk}/'))
+
+        if not options['only']:
+            self.explain_validators()
+
+    def get_user(self, email):
+        if email:
+            user = User.objects.select_related('role').filter(email=email).first()
+            if user is None:
+                raise CommandError(f"No user with email {email!r}.")
+            return user
+        users = User.objects.select_related('role').filter(role__isnull=False).order_by('id')
+        user = users.filter(role__parent_role__isnull=True).first() or users.first()
+        if user is None:
+            raise CommandError("No user with a role found; pass --user.")
+        return user
+
+    def explain_validators(self):
+        """The uniqueness / existence lookups the validators run before a write."""
+        samples = [
+            ("CustomerValidator", lambda: CustomerValidator(
+                {'name': 'Explain', 'email': 'Explain@Example.com', 'mobile': '0000000000'}).is_valid()),
+            ("ProductValidator", lambda: ProductValidator(
+                {'name': 'Explain', 'price': 1, 'quantity': 1}).is_valid()),
+            ("UserValidator", lambda: UserValidator(
+                {'name': 'Explain', 'email': 'explain@example.com', 'password': 'secret123', 'role': 1}).is_valid()),
+            ("InvoiceValidator", lambda: InvoiceValidator(
+                {'customer_id': 1, 'items': [{'product_id': 1, 'quantity': 1}, {'product_id': 2, 'quantity': 1}]}).is_valid()),
+        ]
+        for label, run in samples:
+            self.explain(label, run)
+
+    def explain(self, label, run):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            result = run()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"== {label} ({len(recorder.queries)} distinct queries)"))
+        prefix = connection.ops.explain_query_prefix()
+        for sql, params in recorder.queries.items():
+            self.stdout.write(sql)
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {sql}', params)
+                for row in cursor.fetchall():
+                    self.stdout.write('    ' + ' '.join(str(column) for column in row))
+            self.stdout.write('')
+        return result
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sales_app.models import Role, RoleClosure
+from sales_app.permissions import permission_matrix, invalidate_roles
+
+
+class Command(BaseCommand):
+    help = "Recompute the role hierarchy closure table from Role.parent_role (after bulk imports or raw updates)."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            RoleClosure.objects.rebuild()
+            # the child role ids are compiled into the matrix and the JWT claims
+            permission_matrix.invalidate()
+            invalidate_roles(Role.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f"Role closure rebuilt: {RoleClosure.objects.count()} rows."))
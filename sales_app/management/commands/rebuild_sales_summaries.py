@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from sales_app.models import DailySalesSummary, DailyCustomerSales, DailyProductSales
+from sales_app.reporting import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales summary tables from Invoice and InvoiceProduct."
+
+    def handle(self, *args, **options):
+        rebuild_summaries()
+        for model in (DailySalesSummary, DailyCustomerSales, DailyProductSales):
+            self.stdout.write(f"{model.__name__}: {model.objects.count()} rows")
+        self.stdout.write(self.style.SUCCESS("Sales summaries rebuilt."))
@@ -0,0 +1,225 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from sales_app.models import (
+    Role, Permission, User, Customer, Product, Invoice, InvoiceProduct, RoleClosure,
+    DailySalesSummary, DailyCustomerSales, DailyProductSales
+)
+from sales_app.catalog import invalidate_catalog
+from sales_app.permissions import permission_matrix
+from sales_app.reporting import rebuild_summaries
+
+MODELS = ['user', 'role', 'permission', 'customer', 'product', 'invoice', 'invoiceproduct']
+
+# README permission tables: (create, read, update, delete) per level
+LEVEL_PERMISSIONS = {
+    'manager': {model: (True, True, True, False) for model in MODELS},
+    'employee': {model: (True, True, False, False) for model in MODELS},
+    'cashier': {
+        'product': (False, True, False, False),
+        'invoice': (True, True, False, False),
+        'invoiceproduct': (True, True, False, False),
+    },
+}
+
+STATUS_WEIGHTS = (('pending', 3), ('paid', 6), ('refused', 1))
+FIRST_NAMES = ['Ahmed', 'Sara', 'Omar', 'Mona', 'Youssef', 'Laila', 'Karim', 'Nour', 'Hassan', 'Dina']
+LAST_NAMES = ['Ali', 'Hassan', 'Mahmoud', 'Ibrahim', 'Saleh', 'Fathy', 'Nabil', 'Adel', 'Samir', 'Kamal']
+PRODUCT_WORDS = ['Steel', 'Cotton', 'Smart', 'Classic', 'Mini', 'Pro', 'Eco', 'Ultra', 'Compact', 'Prime']
+PRODUCT_KINDS = ['Lamp', 'Chair', 'Phone', 'Kettle', 'Desk', 'Router', 'Bag', 'Watch', 'Fan', 'Shelf']
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at / updated_at values we set (backdated rows)."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset (role tree admin > sales managers > sales employees > "
+        "cashiers, users, customers, products, invoices) with bulk_create and a fixed seed. "
+        "Users are <level><n>.<i>@seed.local (e.g. manager1.0@seed.local), all with --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--managers', type=int, default=4)
+        parser.add_argument('--employees-per-manager', type=int, default=5)
+        parser.add_argument('--cashiers-per-employee', type=int, default=5)
+        parser.add_argument('--users-per-role', type=int, default=10)
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--invoices', type=int, default=100000)
+        parser.add_argument('--max-lines', type=int, default=5, help="Line items per invoice: 1..max-lines.")
+        parser.add_argument('--days', type=int, default=365, help="Spread invoices over the last N days.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='secret123')
+        parser.add_argument('--clear', action='store_true', help="Delete existing sales data (not superusers) first.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        if options['clear']:
+            self.step("clear", self.clear)
+        with explicit_timestamps(Role, User, Customer, Product, Invoice, InvoiceProduct):
+            roles = self.step("roles", self.seed_roles, options)
+            users = self.step("users", self.seed_users, roles, options)
+            customer_ids = self.step("customers", self.seed_customers, options['customers'], users)
+            products = self.step("products", self.seed_products, options['products'], users)
+            self.step("invoices", self.seed_invoices, options, users, customer_ids, products)
+
+        self.step("role closure", RoleClosure.objects.rebuild)
+        self.step("sales summaries", rebuild_summaries)
+        permission_matrix.invalidate()
+        invalidate_catalog(Product)
+        invalidate_catalog(Customer)
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {time.perf_counter() - started:.1f}s."))
+
+    def step(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f"{label}: {time.perf_counter() - started:.1f}s")
+        return result
+
+    def timestamp(self, days):
+        return self.now - timedelta(days=self.rng.uniform(0, days))
+
+    def clear(self):
+        for model in (InvoiceProduct, Invoice, DailyProductSales, DailyCustomerSales, DailySalesSummary, Customer, Product):
+            model.objects.all().delete()
+        User.objects.filter(is_superuser=False).delete()
+        Permission.objects.all().delete()
+        RoleClosure.objects.all().delete()
+        Role.objects.all().delete()
+
+    @transaction.atomic
+    def seed_roles(self, options):
+        """{level: [Role]} following the README hierarchy."""
+        levels = {'admin': Role.objects.bulk_create([Role(name='Admin', created_at=self.now, updated_at=self.now)])}
+        tree = [
+            ('manager', 'admin', options['managers'], 'Sales Manager'),
+            ('employee', 'manager', options['employees_per_manager'], 'Sales Employee'),
+            ('cashier', 'employee', options['cashiers_per_employee'], 'Cashier'),
+        ]
+        for level, parent_level, per_parent, label in tree:
+            parents = [parent for parent in levels[parent_level] for _ in range(per_parent)]
+            levels[level] = Role.objects.bulk_create([
+                Role(name=f'{label} {number}', parent_role=parent, created_at=self.now, updated_at=self.now)
+                for number, parent in enumerate(parents, 1)
+            ])
+
+        Permission.objects.bulk_create([
+            Permission(role=role, model_name=model_name, create=c, read=r, update=u, delete=d)
+            for level, permissions in LEVEL_PERMISSIONS.items()
+            for role in levels[level]
+            for model_name, (c, r, u, d) in permissions.items()
+        ], batch_size=self.batch_size)
+        return levels
+
+    @transaction.atomic
+    def seed_users(self, roles, options):
+        """{level: [User]}; the password is hashed once and shared."""
+        password = make_password(options['password'])
+        users = {}
+        for level, level_roles in roles.items():
+            batch = []
+            for number, role in enumerate(level_roles, 1):
+                for index in range(options['users_per_role']):
+                    email = f'{level}{number}.{index}@seed.local'
+                    created = self.timestamp(options['days'])
+                    batch.append(User(
+                        username=email, email=email, password=password, role=role,
+                        name=f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}',
+                        created_at=created, updated_at=created, date_joined=created,
+                    ))
+            users[level] = User.objects.bulk_create(batch, batch_size=self.batch_size)
+        return users
+
+    @transaction.atomic
+    def seed_customers(self, count, users):
+        creators = users['employee'] or users['admin']
+        ids = []
+        for start in range(0, count, self.batch_size):
+            batch = []
+            for index in range(start, min(start + self.batch_size, count)):
+                created = self.timestamp(365)
+                name = f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+                address = f'{self.rng.randint(1, 200)} Street {self.rng.randint(1, 90)}'
+                creator = self.rng.choice(creators)
+                batch.append(Customer(
+                    name=name, email=f'customer{index}@seed.local', mobile=f'01{index:09d}', address=address,
+                    created_by=creator, owner_role_id=creator.role_id, created_at=created, updated_at=created,
+                ))
+            ids.extend(customer.pk for customer in Customer.objects.bulk_create(batch))
+        return ids
+
+    @transaction.atomic
+    def seed_products(self, count, users):
+        """[(id, price)]; stock is large enough that seeded invoices never run out."""
+        products = []
+        for index in range(count):
+            name = f'{self.rng.choice(PRODUCT_WORDS)} {self.rng.choice(PRODUCT_KINDS)} {index}'
+            price = Decimal(self.rng.randint(100, 50000)) / 100
+            creator = self.rng.choice(users['admin'])
+            products.append(Product(
+                name=name, price=price, quantity=10 ** 7,
+                created_by=creator, owner_role_id=creator.role_id, created_at=self.now, updated_at=self.now,
+            ))
+        return [(product.pk, product.price) for product in Product.objects.bulk_create(products, batch_size=self.batch_size)]
+
+    def seed_invoices(self, options, users, customer_ids, products):
+        # invoices are written mostly by cashiers and employees
+        creators = users['cashier'] * 6 + users['employee'] * 3 + users['manager']
+        statuses = [status for status, weight in STATUS_WEIGHTS for _ in range(weight)]
+        total, max_lines = options['invoices'], min(options['max_lines'], len(products))
+
+        for start in range(0, total, self.batch_size):
+            with transaction.atomic():
+                invoices, lines = [], []
+                for _ in range(min(self.batch_size, total - start)):
+                    created = self.timestamp(options['days'])
+                    creator = self.rng.choice(creators)
+                    items = [
+                        (product_id, price, self.rng.randint(1, 5))
+                        for product_id, price in self.rng.sample(products, self.rng.randint(1, max_lines))
+                    ]
+                    invoices.append(Invoice(
+                        customer_id=self.rng.choice(customer_ids), created_by=creator, owner_role_id=creator.role_id,
+                        invoice_date=timezone.localdate(created), status=self.rng.choice(statuses),
+                        total_amount=sum(price * quantity for _, price, quantity in items),
+                        created_at=created, updated_at=created,
+                    ))
+                    lines.append(items)
+
+                Invoice.objects.bulk_create(invoices)
+                InvoiceProduct.objects.bulk_create([
+                    InvoiceProduct(
+                        invoice_id=invoice.pk, product_id=product_id, quantity=quantity,
+                        amount=price * quantity, created_by=invoice.created_by, owner_role_id=invoice.owner_role_id,
+                        created_at=invoice.created_at, updated_at=invoice.created_at,
+                    )
+                    for invoice, items in zip(invoices, lines)
+                    for product_id, price, quantity in items
+                ], batch_size=self.batch_size)
+            self.stdout.write(f"  {start + len(invoices)}/{total} invoices")
@@ -0,0 +1,252 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.functional import SimpleLazyObject
+
+slow_query_logger = logging.getLogger('sales_app.slow_queries')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'sales_requests_total': ('counter', "Requests by route, action, method and status class.", None),
+    'sales_request_duration_seconds': ('histogram', "Request latency (sampled requests).", LATENCY_BUCKETS),
+    'sales_request_queries': ('histogram', "SQL queries per request (sampled requests).", QUERY_BUCKETS),
+    'sales_request_sql_seconds_total': ('counter', "Time spent in SQL (sampled requests).", None),
+    'sales_request_rows_serialized_total': ('counter', "Rows in DRF response data (sampled requests).", None),
+    'sales_response_bytes_total': ('counter', "Response body bytes, streaming responses excluded (sampled requests).", None),
+    'sales_slow_queries_total': ('counter', "Queries slower than SALES_SLOW_QUERY_MS.", None),
+}
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms, rendered in the Prometheus text
+    format. Each worker process keeps its own registry, so scrape every
+    worker (or label them) when running several.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {name: {} for name in METRICS}
+
+    def inc(self, name, labels, value=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name].get(key)
+            if series is None:
+                series = self._values[name][key] = {'buckets': [0] * len(buckets), 'sum': 0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def reset(self):
+        with self._lock:
+            self._values = {name: {} for name in METRICS}
+
+    def render(self):
+        lines = [
+            '# HELP sales_metrics_sample_rate Share of requests that are timed.',
+            '# TYPE sales_metrics_sample_rate gauge',
+            f'sales_metrics_sample_rate {settings.SALES_METRICS_SAMPLE_RATE}',
+        ]
+        with self._lock:
+            for name, (kind, help_text, buckets) in METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, value in sorted(self._values[name].items()):
+                    labels = dict(key)
+                    if kind == 'counter':
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+                        continue
+                    for bound, count in zip(buckets, value['buckets']):
+                        lines.append(f'{name}_bucket{format_labels({**labels, "le": bound})} {count}')
+                    lines.append(f'{name}_bucket{format_labels({**labels, "le": "+Inf"})} {value["count"]}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {value["sum"]}')
+                    lines.append(f'{name}_count{format_labels(labels)} {value["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def route_labels(request):
+    """view name and DRF action of the resolved route (low cardinality)."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return {'route': 'unmatched', 'action': '', 'method': request.method}
+    actions = getattr(match.func, 'actions', None) or {}
+    return {
+        'route': match.view_name or match.route,
+        'action': actions.get(request.method.lower(), ''),
+        'method': request.method,
+    }
+
+
+def request_role_id(request):
+    """role_id of the user DRF authenticated, without triggering a lookup."""
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, SimpleLazyObject):
+        return None
+    return getattr(user, 'role_id', None)
+
+
+def rows_serialized(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return len(data['results'])
+    if isinstance(data, list):
+        return len(data)
+    return 1 if data else 0
+
+
+class QueryTimer:
+    """Counts and times the queries of one request (see time_query)."""
+
+    def __init__(self, request):
+        self.request = request
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.slow_ms = settings.SALES_SLOW_QUERY_MS
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.count += 1
+                self.seconds += elapsed
+            if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                self.log_slow(sql, elapsed)
+
+    def log_slow(self, sql, elapsed):
+        labels = route_labels(self.request)
+        registry.inc('sales_slow_queries_total', {'route': labels['route'], 'action': labels['action']})
+        slow_query_logger.warning(
+            "slow query %.1fms route=%s action=%s role_id=%s: %s",
+            elapsed * 1000, labels['route'], labels['action'], request_role_id(self.request), sql,
+        )
+
+
+# the QueryTimer of the sampled request being served. sync_to_async copies the
+# context into its worker thread, so the queries the async ORM runs there are
+# counted too, although they go through that thread's own connections.
+current_timer = ContextVar('sales_query_timer', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # connections are per thread; each one gets the wrapper when it connects.
+    # First in the list, so execute_wrapper() blocks popping theirs keep it.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+class MetricsMiddleware:
+    """
+    Per-route request metrics. Every request is counted; a
+    SALES_METRICS_SAMPLE_RATE share of them is also timed, with time_query
+    counting and timing its SQL (and logging slow queries). Runs natively
+    under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.SALES_METRICS_ENABLED:
+            return self.get_response(request)
+        timer, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(token)
+        return self.record(request, response, timer)
+
+    async def __acall__(self, request):
+        if not settings.SALES_METRICS_ENABLED:
+            return await self.get_response(request)
+        timer, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(token)
+        return self.record(request, response, timer)
+
+    def start(self, request):
+        if random.random() >= settings.SALES_METRICS_SAMPLE_RATE:
+            return None, None
+        timer = QueryTimer(request)
+        return timer, current_timer.set(timer)
+
+    def stop(self, token):
+        if token is not None:
+            current_timer.reset(token)
+
+    def record(self, request, response, timer):
+        labels = self.count(request, response)
+        if timer is None:
+            return response
+        registry.observe('sales_request_duration_seconds', labels, time.perf_counter() - timer.started)
+        registry.observe('sales_request_queries', labels, timer.count)
+        registry.inc('sales_request_sql_seconds_total', labels, timer.seconds)
+        registry.inc('sales_request_rows_serialized_total', labels, rows_serialized(response))
+        if not response.streaming:
+            registry.inc('sales_response_bytes_total', labels, len(response.content))
+        return response
+
+    def count(self, request, response):
+        labels = route_labels(request)
+        registry.inc('sales_requests_total', {**labels, 'status': f'{response.status_code // 100}xx'})
+        return labels
+
+
+def metrics_view(request):
+    token = settings.SALES_METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_role_closure(apps, schema_editor):
+    Role = apps.get_model('sales_app', 'Role')
+    RoleClosure = apps.get_model('sales_app', 'RoleClosure')
+
+    parents = dict(Role.objects.values_list('id', 'parent_role_id'))
+    rows = []
+    for role_id in parents:
+        ancestor_id, depth, seen = role_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append(RoleClosure(ancestor_id=ancestor_id, descendant_id=role_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    RoleClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='sales_app.role')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='sales_app.role')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='role_closure_desc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_role_closure')],
+            },
+        ),
+        migrations.RunPython(build_role_closure, migrations.RunPython.noop),
+    ]
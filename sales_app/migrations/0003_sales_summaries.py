@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0002_role_closure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCustomerSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(blank=True, max_length=20, null=True)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sales_app.customer')),
+                ('role', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'role', 'customer'], name='daily_customer_date_role_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(blank=True, max_length=20, null=True)),
+                ('quantity', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='sales_app.product')),
+                ('role', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'role', 'product'], name='daily_product_date_role_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(blank=True, max_length=20, null=True)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('role', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'role'], name='daily_sales_date_role_idx')],
+            },
+        ),
+    ]
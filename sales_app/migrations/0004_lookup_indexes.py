@@ -0,0 +1,119 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:22
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def merge_duplicate_permissions(apps, schema_editor):
+    """Fold duplicate (role, model_name) rows into one, OR-ing their flags."""
+    Permission = apps.get_model('sales_app', 'Permission')
+    kept = {}
+    duplicates = []
+    for perm in Permission.objects.exclude(role__isnull=True).exclude(model_name__isnull=True).order_by('id'):
+        key = (perm.role_id, perm.model_name.lower())
+        if key not in kept:
+            kept[key] = perm
+            continue
+        first = kept[key]
+        for flag in ('create', 'read', 'update', 'delete'):
+            setattr(first, flag, getattr(first, flag) or getattr(perm, flag))
+        duplicates.append(perm.id)
+    for perm in kept.values():
+        perm.model_name = perm.model_name.lower()
+        perm.save(update_fields=['model_name', 'create', 'read', 'update', 'delete'])
+    Permission.objects.filter(id__in=duplicates).delete()
+
+
+def blank_to_null(apps, schema_editor):
+    """Blank values would collide in the new unique indexes; store them as NULL."""
+    Customer = apps.get_model('sales_app', 'Customer')
+    Product = apps.get_model('sales_app', 'Product')
+    Customer.objects.filter(email='').update(email=None)
+    Customer.objects.filter(mobile='').update(mobile=None)
+    Product.objects.filter(name='').update(name=None)
+
+
+def check_unique_values(apps, schema_editor):
+    """
+    Refuse to migrate while customers share an email (case-insensitively) or
+    a mobile, or products share a name: they are referenced by invoices, so
+    which row wins is for a person to decide. Lists every conflicting row.
+    """
+    Customer = apps.get_model('sales_app', 'Customer')
+    Product = apps.get_model('sales_app', 'Product')
+    checks = [
+        (Customer, 'email', Lower('email')),
+        (Customer, 'mobile', models.F('mobile')),
+        (Product, 'name', models.F('name')),
+    ]
+    conflicts = []
+    for model, field, key in checks:
+        rows = model.objects.exclude(**{f'{field}__isnull': True}).annotate(key=key)
+        duplicated = rows.values('key').annotate(rows=Count('id')).filter(rows__gt=1).values('key')
+        for pk, value in rows.filter(key__in=duplicated).order_by('key', 'id').values_list('id', field):
+            conflicts.append(f'  {model.__name__} id={pk} {field}={value!r}')
+    if conflicts:
+        raise RuntimeError(
+            "Cannot add the unique customer email / mobile and product name constraints. "
+            "Rename or merge these rows, then migrate again:\n" + "\n".join(conflicts)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('sales_app', '0003_sales_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_permissions, migrations.RunPython.noop),
+        migrations.RunPython(blank_to_null, migrations.RunPython.noop),
+        migrations.RunPython(check_unique_values, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_at', 'id'], name='invoice_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='invoice_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'invoice_date'], name='invoice_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['invoice_date'], name='invoice_pending_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at', 'id'], name='user_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='customer_email_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='customer',
+            constraint=models.UniqueConstraint(fields=('mobile',), name='customer_mobile_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='permission',
+            constraint=models.UniqueConstraint(fields=('role', 'model_name'), name='permission_role_model_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('name',), name='product_name_unique'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# table: indexed columns (see sales_app.search.SEARCH_FIELDS)
+SEARCH_COLUMNS = {
+    'sales_app_customer': ('name', 'email', 'mobile'),
+    'sales_app_product': ('name',),
+}
+
+
+def sqlite_statements(table, columns):
+    """External-content FTS5 table over `columns`, kept in sync by triggers."""
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        # only the indexed columns: stock updates on every invoice leave the index alone
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgres_statements(table, columns):
+    """Trigram GIN indexes on UPPER(column), the expression Django's icontains compares."""
+    return [
+        f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} USING gin (UPPER({column}) gin_trgm_ops)'
+        for column in columns
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return  # sales_app.search falls back to icontains
+        statements = [sql for table, columns in SEARCH_COLUMNS.items() for sql in sqlite_statements(table, columns)]
+    elif vendor == 'postgresql':
+        statements = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+            sql for table, columns in SEARCH_COLUMNS.items() for sql in postgres_statements(table, columns)
+        ]
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, columns in SEARCH_COLUMNS.items():
+        if vendor == 'sqlite':
+            # dropping the virtual table drops nothing else: remove the triggers first
+            for suffix in ('insert', 'delete', 'update'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif vendor == 'postgresql':
+            for column in columns:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0004_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('sale', 'Sale'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.invoice')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='sales_app.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'), models.Index(fields=['created_at'], name='stock_movement_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='sales_app.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'shard'), name='stock_shard_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_owner_role(apps, schema_editor):
+    """owner_role = the creator's current role, one UPDATE per table."""
+    User = apps.get_model('sales_app', 'User')
+    for model_name in ('Role', 'User', 'Permission', 'Customer', 'Product', 'Invoice', 'InvoiceProduct'):
+        model = apps.get_model('sales_app', model_name)
+        model.objects.filter(created_by__isnull=False).update(
+            owner_role_id=Subquery(User.objects.filter(pk=OuterRef('created_by_id')).values('role_id')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('sales_app', '0006_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='owner_role',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='owner_role',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role'),
+        ),
+        migrations.AddField(
+            model_name='invoiceproduct',
+            name='owner_role',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role'),
+        ),
+        migrations.AddField(
+            model_name='permission',
+            name='owner_role',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='owner_role',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role'),
+        ),
+        migrations.AddField(
+            model_name='role',
+            name='owner_role',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='owner_role',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sales_app.role'),
+        ),
+        migrations.RunPython(backfill_owner_role, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['owner_role', 'created_at', 'id'], name='customer_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['owner_role', 'created_at', 'id'], name='invoice_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceproduct',
+            index=models.Index(fields=['owner_role', 'created_at', 'id'], name='invoiceproduct_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='permission',
+            index=models.Index(fields=['owner_role', 'created_at', 'id'], name='permission_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['owner_role', 'created_at', 'id'], name='product_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='role',
+            index=models.Index(fields=['owner_role', 'created_at', 'id'], name='role_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['owner_role', 'created_at', 'id'], name='user_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0007_owner_role'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='invoice_status_created_idx'),
+        ),
+    ]
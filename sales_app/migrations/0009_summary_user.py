@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def rebuild_summaries(apps, schema_editor):
+    """Existing summary rows have no user: recompute them from the invoices."""
+    Invoice = apps.get_model('sales_app', 'Invoice')
+    InvoiceProduct = apps.get_model('sales_app', 'InvoiceProduct')
+    DailySalesSummary = apps.get_model('sales_app', 'DailySalesSummary')
+    DailyCustomerSales = apps.get_model('sales_app', 'DailyCustomerSales')
+    DailyProductSales = apps.get_model('sales_app', 'DailyProductSales')
+    for model in (DailySalesSummary, DailyCustomerSales, DailyProductSales):
+        model.objects.all().delete()
+
+    invoices = Invoice.objects.annotate(
+        day=Coalesce('invoice_date', TruncDate('created_at')), role_key=F('owner_role_id'), user_key=F('created_by_id')
+    ).filter(day__isnull=False)
+    for dimensions, model, extra in (
+        (('day', 'status', 'role_key', 'user_key'), DailySalesSummary, ()),
+        (('day', 'status', 'role_key', 'user_key', 'customer_id'), DailyCustomerSales, ('customer_id',)),
+    ):
+        rows = invoices.filter(customer__isnull=False) if extra else invoices
+        model.objects.bulk_create((
+            model(date=row['day'], status=row['status'], role_id=row['role_key'], user_id=row['user_key'],
+                  invoice_count=row['count'], total_amount=row['total'] or 0, **{field: row[field] for field in extra})
+            for row in rows.values(*dimensions).annotate(count=Count('id'), total=Sum('total_amount')).order_by().iterator()
+        ), batch_size=1000)
+
+    lines = InvoiceProduct.objects.annotate(
+        day=Coalesce('invoice__invoice_date', TruncDate('invoice__created_at')),
+        role_key=F('invoice__owner_role_id'), user_key=F('invoice__created_by_id'),
+    ).filter(day__isnull=False, product__isnull=False)
+    DailyProductSales.objects.bulk_create((
+        DailyProductSales(date=row['day'], status=row['invoice__status'], role_id=row['role_key'], user_id=row['user_key'],
+                          product_id=row['product_id'], quantity=row['quantity'] or 0, amount=row['amount'] or 0)
+        for row in lines.values('day', 'invoice__status', 'role_key', 'user_key', 'product_id')
+        .annotate(quantity=Sum('quantity'), amount=Sum('amount')).order_by().iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0008_invoice_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailycustomersales',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailyproductsales',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailysalessummary',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(rebuild_summaries, migrations.RunPython.noop),
+    ]
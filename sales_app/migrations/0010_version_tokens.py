@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales_app', '0009_summary_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionToken',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('version', models.CharField(max_length=64)),
+            ],
+        ),
+    ]
@@ -3,6 +3,13 @@ from django.db import models
 # Create your models here.
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+# `field__lower=value` compiles to LOWER(field) = value, which can use the
+# functional Lower() indexes below (iexact compiles to LIKE/UPPER and cannot).
+models.CharField.register_lookup(Lower)
 
 # ---------------------------------------------------------
 # 1. Abstract Base Model 
@@ -25,10 +32,26 @@ class BaseModel(models.Model):
         blank=True, 
         related_name="%(class)s_updated"
     )
+    # The creator's role, denormalized so role scoping is one indexed IN on
+    # this table (no join to User, no DISTINCT). Each model indexes it as
+    # (owner_role, created_at, id) for the keyset pagination order.
+    owner_role = models.ForeignKey(
+        'Role',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_index=False,
+        related_name='+'
+    )
 
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.owner_role_id is None and self.created_by_id is not None:
+            self.owner_role_id = self.created_by.role_id
+        super().save(*args, **kwargs)
+
 
 # ---------------------------------------------------------
 # 2. Roles Model (Master)
@@ -44,9 +67,28 @@ class Role(BaseModel):
     )
     status = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_role', 'created_at', 'id'], name='role_owner_idx'),
+        ]
+
     def __str__(self):
         return str(self.name)
 
+    def moves_under_itself(self, parent_role_id):
+        """True when parent_role_id is this role or one of its child roles."""
+        if not self.pk or not parent_role_id:
+            return False
+        return RoleClosure.objects.is_descendant(parent_role_id, self.pk)
+
+    def clean(self):
+        super().clean()
+        if self.moves_under_itself(self.parent_role_id):
+            raise ValidationError({'parent_role': ROLE_CYCLE_MESSAGE})
+
+
+ROLE_CYCLE_MESSAGE = "A role cannot be moved under itself or one of its child roles."
+
 
 # ---------------------------------------------------------
 # 3. Users Model (Master)
@@ -67,6 +109,13 @@ class User(AbstractUser, BaseModel):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'name']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # keyset pagination
+            models.Index(fields=['created_at', 'id'], name='user_created_idx'),
+            models.Index(fields=['owner_role', 'created_at', 'id'], name='user_owner_idx'),
+        ]
+
     def __str__(self):
         return f"{self.email} ({self.role})"
 
@@ -87,6 +136,15 @@ class Permission(BaseModel):
     read = models.BooleanField(default=False)
     update = models.BooleanField(default=False)
     delete = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'model_name'], name='permission_role_model_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner_role', 'created_at', 'id'], name='permission_owner_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         # Always lower case model name to avoid mismatches
         if self.model_name:
@@ -106,6 +164,19 @@ class Customer(BaseModel):
     phone = models.CharField(max_length=20, null=True, blank=True)
     mobile = models.CharField(max_length=20, null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            # CustomerValidator checks LOWER(email) = ... OR mobile = ...
+            # NULLs never collide in a unique index, so no partial condition
+            # is needed (and one would stop the planner from using it).
+            models.UniqueConstraint(Lower('email'), name='customer_email_ci_unique'),
+            models.UniqueConstraint(fields=['mobile'], name='customer_mobile_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+            models.Index(fields=['owner_role', 'created_at', 'id'], name='customer_owner_idx'),
+        ]
+
     def __str__(self):
         return str(self.name)
 
@@ -119,6 +190,15 @@ class Product(BaseModel):
     quantity = models.IntegerField(null=True, blank=True)
     description = models.TextField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name'], name='product_name_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+            models.Index(fields=['owner_role', 'created_at', 'id'], name='product_owner_idx'),
+        ]
+
     def __str__(self):
         return str(self.name)
 
@@ -147,6 +227,19 @@ class Invoice(BaseModel):
         null=True, blank=True
     )
 
+    class Meta:
+        indexes = [
+            # keyset pagination: unscoped (admin), own rows, and rows of the roles below
+            models.Index(fields=['created_at', 'id'], name='invoice_created_idx'),
+            models.Index(fields=['created_by', 'created_at', 'id'], name='invoice_creator_created_idx'),
+            models.Index(fields=['owner_role', 'created_at', 'id'], name='invoice_owner_idx'),
+            # status / date filters, and the pending queue managers work from
+            models.Index(fields=['status', 'invoice_date'], name='invoice_status_date_idx'),
+            # the admin changelist filtered by status, newest first
+            models.Index(fields=['status', 'created_at', 'id'], name='invoice_status_created_idx'),
+            models.Index(fields=['invoice_date'], name='invoice_pending_date_idx', condition=Q(status='pending')),
+        ]
+
     def __str__(self):
         return f"Invoice #{self.id} - {self.status}"
 
@@ -169,5 +262,211 @@ class InvoiceProduct(BaseModel):
     quantity = models.IntegerField(null=True, blank=True)
     amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_role', 'created_at', 'id'], name='invoiceproduct_owner_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product} x {self.quantity}"
+
+
+# ---------------------------------------------------------
+# 9. Role Closure (materialized Role hierarchy)
+# ---------------------------------------------------------
+class RoleClosureManager(models.Manager):
+    """
+    Keeps one row per (ancestor, descendant) pair of the Role tree, including
+    the (role, role) row at depth 0, so a whole subtree is one indexed query.
+    """
+
+    def descendant_ids(self, role, include_self=False):
+        if not role:
+            return []
+        qs = self.filter(ancestor=role)
+        if not include_self:
+            qs = qs.filter(depth__gt=0)
+        return list(qs.values_list('descendant_id', flat=True))
+
+    def is_descendant(self, role, ancestor):
+        return self.filter(ancestor=ancestor, descendant=role).exists()
+
+    def attach(self, role):
+        """Link a role (and the subtree under it) below its current parent."""
+        subtree = list(self.filter(ancestor=role).values_list('descendant_id', 'depth'))
+        if not subtree:
+            self.create(ancestor=role, descendant=role, depth=0)
+            subtree = [(role.pk, 0)]
+        if role.parent_role_id:
+            ancestors = self.filter(descendant_id=role.parent_role_id).values_list('ancestor_id', 'depth')
+            self.bulk_create([
+                self.model(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+                for ancestor_id, up in ancestors
+                for descendant_id, down in subtree
+            ])
+
+    def detach(self, role):
+        """Cut every link between the subtree under a role and the roles above it."""
+        subtree_ids = list(self.filter(ancestor=role).values_list('descendant_id', flat=True))
+        self.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+
+    def rebuild(self):
+        parents = dict(Role.objects.values_list('id', 'parent_role_id'))
+        rows = []
+        for role_id in parents:
+            ancestor_id, depth, seen = role_id, 0, set()
+            while ancestor_id is not None and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                rows.append(self.model(ancestor_id=ancestor_id, descendant_id=role_id, depth=depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        self.all().delete()
+        self.bulk_create(rows, batch_size=1000)
+
+
+class RoleClosure(models.Model):
+    ancestor = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        related_name='descendant_links'
+    )
+    descendant = models.ForeignKey(
+        Role,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links'
+    )
+    depth = models.PositiveIntegerField(default=0)
+
+    objects = RoleClosureManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_role_closure'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='role_closure_desc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
+# ---------------------------------------------------------
+# 10. Sales Summaries (pre-aggregated reporting tables)
+# ---------------------------------------------------------
+# Maintained incrementally by sales_app.reporting in the same transaction as
+# the invoice writes, and recomputed by `manage.py rebuild_sales_summaries`.
+# A bucket may be split over several rows under concurrent inserts; reports
+# always SUM() so that is harmless, and a rebuild compacts them again.
+# role is the invoice's owner_role and user its creator, so reports can be
+# scoped like the invoice list: own rows plus the rows of the child roles.
+class SalesSummary(models.Model):
+    date = models.DateField()
+    status = models.CharField(max_length=20, null=True, blank=True)
+    role = models.ForeignKey(
+        Role,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        abstract = True
+
+
+class DailySalesSummary(SalesSummary):
+    invoice_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'role'], name='daily_sales_date_role_idx'),
+        ]
+
+
+class DailyCustomerSales(SalesSummary):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+')
+    invoice_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'role', 'customer'], name='daily_customer_date_role_idx'),
+        ]
+
+
+class DailyProductSales(SalesSummary):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'role', 'product'], name='daily_product_date_role_idx'),
+        ]
+
+
+# ---------------------------------------------------------
+# 11. Stock ledger and sharded stock counters
+# ---------------------------------------------------------
+# Every stock change appends a StockMovement. Most products keep their stock
+# in Product.quantity (locked and decremented per invoice). A hot product can
+# be sharded (`manage.py compact_stock --shard ID`): its stock then lives in
+# StockShard rows, invoices decrement one shard and never lock the Product
+# row, and Product.quantity becomes the balance as of the last compaction.
+class StockMovement(models.Model):
+    REASON_CHOICES = (
+        ('sale', 'Sale'),
+        ('adjustment', 'Adjustment'),
+    )
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    quantity = models.IntegerField()  # signed: sales are negative
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='stock_movement_product_idx'),
+            models.Index(fields=['created_at'], name='stock_movement_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.quantity:+d} ({self.reason})"
+
+
+class StockShard(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='stock_shard_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}#{self.shard}: {self.quantity}"
+
+
+# ---------------------------------------------------------
+# 12. Version tokens (shared invalidation, see sales_app.cache)
+# ---------------------------------------------------------
+class VersionToken(models.Model):
+    key = models.CharField(max_length=200, primary_key=True)
+    version = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
@@ -0,0 +1,134 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    """
+    select_related / prefetch_related / only() derived from the fields a
+    serializer actually reads. `only` is None when some field needs the whole
+    object (source='*', properties, methods) and cannot be narrowed.
+    `annotations` are the serializer's query_annotations ({name: expression
+    factory}), read by the serializer from the annotated rows.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.select_related = set()
+        self.prefetch_related = []
+        self.only = {model._meta.pk.name}
+        self.annotations = {}
+
+    def add_only(self, path):
+        if self.only is not None:
+            self.only.add(path)
+
+    def merge(self, other, prefix):
+        self.select_related.update(f'{prefix}__{path}' for path in other.select_related)
+        for lookup in other.prefetch_related:
+            if isinstance(lookup, Prefetch):
+                lookup.add_prefix(prefix)
+            else:
+                lookup = f'{prefix}__{lookup}'
+            self.prefetch_related.append(lookup)
+        if other.only is None:
+            self.only = None
+        else:
+            for path in other.only:
+                self.add_only(f'{prefix}__{path}')
+
+    def apply(self, queryset, defer_fields=True):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if defer_fields and self.only is not None:
+            queryset = queryset.only(*sorted(self.only))
+        if self.annotations:
+            queryset = queryset.annotate(**{name: expression() for name, expression in self.annotations.items()})
+        return queryset
+
+
+def build_query_plan(serializer, model=None):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = model or serializer.Meta.model
+    plan = QueryPlan(model)
+    plan.annotations.update(getattr(serializer, 'query_annotations', {}))
+    prefetched = set()
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            plan.only = None
+            continue
+
+        current, path = model, []
+        for position, attr in enumerate(field.source_attrs):
+            last = position == len(field.source_attrs) - 1
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                plan.only = None
+                break
+
+            lookup = '__'.join(path + [attr])
+            if not model_field.is_relation:
+                plan.add_only(lookup)
+                break
+
+            if model_field.many_to_many or model_field.one_to_many:
+                nested = field.child if isinstance(field, serializers.ListSerializer) else None
+                if nested is not None and last and not path:
+                    inner = build_query_plan(nested, model_field.related_model)
+                    if model_field.one_to_many:
+                        # the prefetch joins back on the child's FK column
+                        inner.add_only(model_field.field.attname)
+                    related_qs = inner.apply(model_field.related_model._default_manager.all())
+                    plan.prefetch_related.append(Prefetch(lookup, queryset=related_qs))
+                else:
+                    plan.prefetch_related.append(lookup)
+                break
+
+            if not model_field.concrete:
+                # reverse one-to-one: not worth narrowing
+                plan.only = None
+                break
+
+            plan.add_only(lookup)
+            if last:
+                if isinstance(field, serializers.BaseSerializer):
+                    inner = build_query_plan(field, model_field.related_model)
+                    if inner.annotations:
+                        # annotations do not come through a join: one query for all the related
+                        # rows, whole, since other fields may read them through `lookup` too
+                        related_qs = inner.apply(model_field.related_model._default_manager.all(), defer_fields=False)
+                        plan.prefetch_related.append(Prefetch(lookup, queryset=related_qs))
+                        prefetched.add(lookup)
+                    else:
+                        plan.select_related.add(lookup)
+                        plan.merge(inner, lookup)
+                # PrimaryKeyRelatedField reads the <fk>_id column, no join needed
+                break
+
+            plan.select_related.add(lookup)
+            path.append(attr)
+            current = model_field.related_model
+
+    for lookup in prefetched:
+        # a joined row would be cached first and the prefetch, with its annotations, skipped
+        plan.select_related = {
+            path for path in plan.select_related if path != lookup and not path.startswith(f'{lookup}__')
+        }
+        if plan.only is not None:
+            plan.only = {path for path in plan.only if not path.startswith(f'{lookup}__')}
+    return plan
+
+
+def optimize_queryset(queryset, serializer, defer_fields=True, always_load=()):
+    """`always_load`: columns read outside the serializer (e.g. the pagination key)."""
+    plan = build_query_plan(serializer, queryset.model)
+    for field in always_load:
+        plan.add_only(field)
+    return plan.apply(queryset, defer_fields=defer_fields)
@@ -1,71 +1,215 @@
+import threading
+from django.conf import settings
 from rest_framework import permissions
-from .models import Permission, Role
-
-def get_all_child_roles(role):
-    
-    if not role:
-        return []
-    children = Role.objects.filter(parent_role=role)
-    result = list(children)
-    for child in children:
-        result.extend(get_all_child_roles(child))
-    return result
+from .cache import get_version, invalidate
+from .models import Permission, Role, RoleClosure, User
 
-class DynamicHierarchicalPermission(permissions.BasePermission):
-    def has_permission(self, request, view):
-        if not request.user.is_authenticated:
-            return False
-        
-        if request.user.role and request.user.role.name.lower() == 'admin':
-            return True
-        try:
-            model_name = view.queryset.model.__name__
-        except AttributeError:
-            return False
+PERMISSION_BITS = {'read': 1, 'create': 2, 'update': 4, 'delete': 8}
 
-        action = request.method
-        
-        perm_map = {
-            'GET': 'read',
-            'POST': 'create',
-            'PUT': 'update',
-            'PATCH': 'update',
-            'DELETE': 'delete'
-        }
-        perm_type = perm_map.get(action)
-        if not perm_type:
-            return False
+METHOD_PERMISSIONS = {
+    'GET': 'read',
+    'POST': 'create',
+    'PUT': 'update',
+    'PATCH': 'update',
+    'DELETE': 'delete'
+}
 
-        has_perm = Permission.objects.filter(
-            role=request.user.role,
-            model_name__iexact=model_name, 
-            **{perm_type: True}
-        ).exists()
 
-        return has_perm
+class PermissionMatrix:
+    """
+    Process-wide compiled copy of the Permission table:
+    {role_id: {model_name: bitmask}} plus the role names and the child role
+    ids of every role (from RoleClosure).
+    Reloaded (one query each) only when the shared version token changes.
+    """
+    version_key = 'sales_app:permission_matrix'
 
-    def has_object_permission(self, request, view, obj):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._permissions = {}
+        self._role_names = {}
+        self._child_role_ids = {}
+
+    def _load(self):
+        version = get_version(self.version_key)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            compiled = {}
+            rows = Permission.objects.values_list('role_id', 'model_name', 'read', 'create', 'update', 'delete')
+            for role_id, model_name, *flags in rows:
+                bits = sum(bit for bit, allowed in zip(PERMISSION_BITS.values(), flags) if allowed)
+                role_perms = compiled.setdefault(role_id, {})
+                key = (model_name or '').lower()
+                role_perms[key] = role_perms.get(key, 0) | bits
+            role_names = {
+                role_id: (name or '').lower()
+                for role_id, name in Role.objects.values_list('id', 'name')
+            }
+            children = {}
+            for ancestor_id, descendant_id in RoleClosure.objects.filter(depth__gt=0).values_list(
+                'ancestor_id', 'descendant_id'
+            ):
+                children.setdefault(ancestor_id, set()).add(descendant_id)
+            self._permissions, self._role_names = compiled, role_names
+            self._child_role_ids = {role_id: frozenset(ids) for role_id, ids in children.items()}
+            # last: readers skip the lock once the version matches
+            self._version = version
+
+    def bits(self, role_id, model_name):
+        self._load()
+        return self._permissions.get(role_id, {}).get(model_name.lower(), 0)
+
+    def role_permissions(self, role_id):
+        self._load()
+        return dict(self._permissions.get(role_id, {}))
+
+    def role_name(self, role_id):
+        self._load()
+        return self._role_names.get(role_id)
+
+    def child_role_ids(self, role_id):
+        self._load()
+        return self._child_role_ids.get(role_id, frozenset())
+
+    def has_permission(self, role_id, model_name, perm_type):
+        return bool(self.bits(role_id, model_name) & PERMISSION_BITS[perm_type])
+
+    def invalidate(self):
+        invalidate(self.version_key)
+
+
+permission_matrix = PermissionMatrix()
+
+
+def is_admin_role(role_id):
+    return role_id is not None and permission_matrix.role_name(role_id) == 'admin'
+
+
+# ---------------------------------------------------------
+# JWT permission claims (SALES_JWT_PERMISSION_CLAIMS)
+# ---------------------------------------------------------
+ROLE_VERSION_KEY = 'sales_app:role_version:{}'
+
+
+def role_version(role_id):
+    return get_version(ROLE_VERSION_KEY.format(role_id))
+
+
+def invalidate_roles(role_ids):
+    for role_id in role_ids:
+        invalidate(ROLE_VERSION_KEY.format(role_id))
+
+
+def build_permission_claims(user):
+    role_id = user.role_id
+    return {
+        'role_id': role_id,
+        'role_version': role_version(role_id) if role_id else None,
+        'is_admin': is_admin_role(role_id),
+        'child_role_ids': sorted(permission_matrix.child_role_ids(role_id)),
+        'perms': permission_matrix.role_permissions(role_id),
+    }
+
+
+def get_token_claims(request):
+    """
+    Authorization claims signed into the access token, or None when claims are
+    disabled, missing, or outdated (role reassigned or role_version bumped).
+    """
+    if not getattr(settings, 'SALES_JWT_PERMISSION_CLAIMS', False):
+        return None
+    token = getattr(request, 'auth', None)
+    if token is None or 'perms' not in getattr(token, 'payload', {}):
+        return None
+    role_id = token.get('role_id')
+    if role_id is None or role_id != request.user.role_id:
+        return None
+    if token.get('role_version') != role_version(role_id):
+        return None
+    return token.payload
+
+
+class AuthContext:
+    """
+    What the permission checks and row scoping need to know about the user of
+    one request: the role, its child role ids, the permission bitmap and the
+    admin flag. Built once per request by get_auth_context, from the token
+    claims when they are valid and from the permission matrix otherwise, so
+    every later check is a dict/set lookup.
+    """
+    __slots__ = ('user_id', 'role_id', 'role_name', 'is_admin', 'child_role_ids', 'perms')
+
+    def __init__(self, user_id, role_id, role_name, is_admin, child_role_ids, perms):
+        self.user_id = user_id
+        self.role_id = role_id
+        self.role_name = role_name
+        self.is_admin = is_admin
+        self.child_role_ids = child_role_ids
+        self.perms = perms
+
+    @classmethod
+    def for_request(cls, request):
         user = request.user
-        
-        if user.role and user.role.name.lower() == 'admin':
+        claims = get_token_claims(request)
+        if claims:
+            is_admin = claims['is_admin']
+            child_role_ids = frozenset(claims['child_role_ids'])
+            perms = claims['perms']
+        else:
+            is_admin = is_admin_role(user.role_id)
+            child_role_ids = permission_matrix.child_role_ids(user.role_id)
+            perms = permission_matrix.role_permissions(user.role_id)
+        role_name = permission_matrix.role_name(user.role_id) if user.role_id else None
+        return cls(user.pk, user.role_id, role_name or '', is_admin, child_role_ids, perms)
+
+    def has_permission(self, model_name, perm_type):
+        return bool(self.perms.get(model_name.lower(), 0) & PERMISSION_BITS[perm_type])
+
+    def can_access(self, obj):
+        """Own rows, rows owned by a child role, and users of a child role."""
+        if getattr(obj, 'created_by_id', None) == self.user_id:
             return True
+        # owner_role is the creator's role (BaseModel), so no creator lookup
+        if getattr(obj, 'owner_role_id', None) in self.child_role_ids:
+            return True
+        if isinstance(obj, User):
+            return obj.pk == self.user_id or obj.role_id in self.child_role_ids
+        return False
+
+
+def get_auth_context(request):
+    """The request's AuthContext, built on first use (authenticated users only)."""
+    context = getattr(request, '_sales_auth_context', None)
+    if context is None or context.user_id != request.user.pk:
+        context = AuthContext.for_request(request)
+        request._sales_auth_context = context
+    return context
+
+
+class DynamicHierarchicalPermission(permissions.BasePermission):
+    def has_permission(self, request, view):
+        if not request.user.is_authenticated:
+            return False
 
-       
-        if hasattr(obj, 'created_by') and obj.created_by == user:
+        context = get_auth_context(request)
+        if context.is_admin:
             return True
+        model_name = getattr(view, 'permission_model_name', None)
+        if model_name is None:
+            try:
+                model_name = view.queryset.model.__name__
+            except AttributeError:
+                return False
 
+        perm_type = METHOD_PERMISSIONS.get(request.method)
+        if not perm_type:
+            return False
+        return context.has_permission(model_name, perm_type)
 
-        if hasattr(obj, 'created_by') and obj.created_by:
-            creator_role = obj.created_by.role
-            child_roles = get_all_child_roles(user.role)
-            
-            
-            if creator_role in child_roles:
-                return True
-        
-        if isinstance(obj, type(user)):
-             if obj == user: return True
-             if obj.role in get_all_child_roles(user.role):
-                 return True
-
-        return False
\ No newline at end of file
+    def has_object_permission(self, request, view, obj):
+        context = get_auth_context(request)
+        return context.is_admin or context.can_access(obj)
@@ -0,0 +1,62 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson, byte-for-byte compatible with DRF's output for the
+    default settings (compact separators, UTF-8, U+2028/U+2029 escaped).
+
+    str / int / dict / list / None / bool / UUID are encoded by orjson; every
+    other type (datetime, date, time, Decimal, timedelta, querysets, ...) is
+    handed to DRF's own JSONEncoder, so it comes out exactly as before.
+    Falls back to DRF's renderer without orjson, for indented output
+    (Accept: application/json; indent=4) and for non-default JSON settings.
+    """
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        if orjson is None or not (self.compact and not self.ensure_ascii):
+            return False
+        return self.get_indent(accepted_media_type, renderer_context or {}) is None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not self.use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = JSONEncoder()
+        try:
+            content = orjson.dumps(
+                data, default=encoder.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, or types the stdlib encoder handles
+            # through its own fallbacks: let DRF render it
+            return super().render(data, accepted_media_type, renderer_context)
+        # same escaping as DRF: JSON allows these, JavaScript string literals do not
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser on orjson for UTF-8 bodies; other charsets and missing orjson use DRF's parser."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
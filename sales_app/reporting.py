@@ -0,0 +1,174 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .models import Invoice, InvoiceProduct, DailySalesSummary, DailyCustomerSales, DailyProductSales
+
+
+# ---------------------------------------------------------
+# Incremental maintenance
+# ---------------------------------------------------------
+def bucket_date(invoice):
+    if invoice.invoice_date:
+        return invoice.invoice_date
+    return timezone.localdate(invoice.created_at) if invoice.created_at else timezone.localdate()
+
+
+def invoice_snapshot(invoice):
+    """The summary dimensions an invoice currently counts under."""
+    return {
+        'date': bucket_date(invoice),
+        'status': invoice.status,
+        'role_id': invoice.owner_role_id,
+        'user_id': invoice.created_by_id,
+        'customer_id': invoice.customer_id,
+        'total_amount': invoice.total_amount or 0,
+    }
+
+
+def _apply_deltas(model, key_fields, deltas):
+    """
+    Add {key: {field: delta}} to the summary rows of `model` with one SELECT,
+    one CASE UPDATE and one bulk INSERT for the keys that have no row yet.
+    """
+    if not deltas:
+        return
+    match = Q()
+    for key in deltas:
+        match |= Q(**dict(zip(key_fields, key)))
+    existing = {}
+    for row in model.objects.filter(match).values('pk', *key_fields):
+        existing.setdefault(tuple(row[field] for field in key_fields), row['pk'])
+
+    value_fields = list(next(iter(deltas.values())))
+    if existing:
+        model.objects.filter(pk__in=existing.values()).update(**{
+            field: Case(
+                *[When(pk=pk, then=F(field) + deltas[key][field]) for key, pk in existing.items()],
+                default=F(field)
+            )
+            for field in value_fields
+        })
+    model.objects.bulk_create([
+        model(**dict(zip(key_fields, key)), **values)
+        for key, values in deltas.items()
+        if key not in existing
+    ])
+
+
+BASE_KEY = ('date', 'status', 'role_id', 'user_id')
+
+
+def record_invoice(snapshot, lines, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) one invoice's contribution to every
+    summary table. `lines` are (product_id, quantity, amount) tuples.
+    """
+    base = (snapshot['date'], snapshot['status'], snapshot['role_id'], snapshot['user_id'])
+    total = snapshot['total_amount'] * sign
+
+    _apply_deltas(DailySalesSummary, BASE_KEY, {
+        base: {'invoice_count': sign, 'total_amount': total},
+    })
+    if snapshot['customer_id']:
+        _apply_deltas(DailyCustomerSales, BASE_KEY + ('customer_id',), {
+            base + (snapshot['customer_id'],): {'invoice_count': sign, 'total_amount': total},
+        })
+
+    products = {}
+    for product_id, quantity, amount in lines:
+        values = products.setdefault(base + (product_id,), {'quantity': 0, 'amount': 0})
+        values['quantity'] += (quantity or 0) * sign
+        values['amount'] += (amount or 0) * sign
+    _apply_deltas(DailyProductSales, BASE_KEY + ('product_id',), products)
+
+
+def invoice_lines(invoice):
+    return list(InvoiceProduct.objects.filter(invoice=invoice).values_list('product_id', 'quantity', 'amount'))
+
+
+# ---------------------------------------------------------
+# Full rebuild
+# ---------------------------------------------------------
+@transaction.atomic
+def rebuild_summaries():
+    day = Coalesce('invoice_date', TruncDate('created_at'))
+    invoices = Invoice.objects.annotate(
+        day=day, role_key=F('owner_role_id'), user_key=F('created_by_id')
+    ).filter(day__isnull=False)
+    lines = InvoiceProduct.objects.annotate(
+        day=Coalesce('invoice__invoice_date', TruncDate('invoice__created_at')),
+        role_key=F('invoice__owner_role_id'),
+        user_key=F('invoice__created_by_id'),
+    ).filter(day__isnull=False, product__isnull=False)
+
+    for model in (DailySalesSummary, DailyCustomerSales, DailyProductSales):
+        model.objects.all().delete()
+
+    DailySalesSummary.objects.bulk_create((
+        DailySalesSummary(date=row['day'], status=row['status'], role_id=row['role_key'], user_id=row['user_key'],
+                          invoice_count=row['count'], total_amount=row['total'] or 0)
+        for row in invoices.values('day', 'status', 'role_key', 'user_key')
+        .annotate(count=Count('id'), total=Sum('total_amount')).order_by().iterator()
+    ), batch_size=1000)
+
+    DailyCustomerSales.objects.bulk_create((
+        DailyCustomerSales(date=row['day'], status=row['status'], role_id=row['role_key'], user_id=row['user_key'],
+                           customer_id=row['customer_id'], invoice_count=row['count'], total_amount=row['total'] or 0)
+        for row in invoices.filter(customer__isnull=False).values('day', 'status', 'role_key', 'user_key', 'customer_id')
+        .annotate(count=Count('id'), total=Sum('total_amount')).order_by().iterator()
+    ), batch_size=1000)
+
+    DailyProductSales.objects.bulk_create((
+        DailyProductSales(date=row['day'], status=row['invoice__status'], role_id=row['role_key'], user_id=row['user_key'],
+                          product_id=row['product_id'], quantity=row['total_quantity'] or 0, amount=row['total'] or 0)
+        for row in lines.values('day', 'invoice__status', 'role_key', 'user_key', 'product_id')
+        .annotate(total_quantity=Sum('quantity'), total=Sum('amount')).order_by().iterator()
+    ), batch_size=1000)
+
+
+# ---------------------------------------------------------
+# Queries
+# ---------------------------------------------------------
+REPORT_GROUPINGS = {
+    'date': (DailySalesSummary, ('date',), ('invoice_count', 'total_amount')),
+    'status': (DailySalesSummary, ('status',), ('invoice_count', 'total_amount')),
+    'role': (DailySalesSummary, ('role_id', 'role__name'), ('invoice_count', 'total_amount')),
+    'customer': (DailyCustomerSales, ('customer_id', 'customer__name'), ('invoice_count', 'total_amount')),
+    'product': (DailyProductSales, ('product_id', 'product__name'), ('quantity', 'amount')),
+}
+
+
+def sales_report(group_by, start=None, end=None, role_ids=None, user_id=None, status=None):
+    """
+    Aggregate the summary rows. role_ids=None means every row (admin);
+    otherwise the rows of those roles plus the rows created by user_id.
+    """
+    model, dimensions, measures = REPORT_GROUPINGS[group_by]
+    queryset = model.objects.all()
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    if role_ids is not None:
+        queryset = queryset.filter(Q(role_id__in=role_ids) | Q(user_id=user_id))
+    if status:
+        queryset = queryset.filter(status=status)
+
+    # annotations may not shadow model fields, hence the sum_ prefix
+    ordering = dimensions[:1] if group_by == 'date' else ['-sum_' + measures[-1]]
+    rows = (
+        queryset.values(*dimensions)
+        .annotate(**{f'sum_{measure}': Sum(measure) for measure in measures})
+        .order_by(*ordering)
+    )
+    # amounts as 2-decimal strings, like the DecimalFields of the serializers
+    return [
+        {
+            key.removeprefix('sum_').replace('__', '_'):
+                f'{value:.2f}' if isinstance(value, Decimal) else value
+            for key, value in row.items()
+        }
+        for row in rows
+    ]
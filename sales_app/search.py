@@ -0,0 +1,181 @@
+import re
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from rest_framework.response import Response
+
+# model_name: columns indexed by migration 0005 (FTS5 table / trigram indexes)
+SEARCH_FIELDS = {
+    'customer': ('name', 'email', 'mobile'),
+    'product': ('name',),
+}
+TOKEN_RE = re.compile(r'\w+')
+MAX_TOKENS = 8
+
+_fts_tables = {}
+
+
+def search_tokens(term):
+    return TOKEN_RE.findall(term.lower())[:MAX_TOKENS]
+
+
+FTS_TRIGGERS = ('insert', 'delete', 'update')
+
+
+def fts_index_state(cursor, table):
+    """(FTS5 table exists, all of its sync triggers exist)"""
+    fts = f'{table}_fts'
+    cursor.execute(
+        "SELECT type, name FROM sqlite_master WHERE (type = 'table' AND name = %s) OR "
+        "(type = 'trigger' AND tbl_name = %s AND name LIKE %s)",
+        [fts, table, f'{fts}_%'],
+    )
+    found = set(cursor.fetchall())
+    triggers = {('trigger', f'{fts}_{suffix}') for suffix in FTS_TRIGGERS}
+    return ('table', fts) in found, triggers <= found
+
+
+def fts_table(connection, model):
+    """
+    Name of the model's FTS5 table, or None if this database has none (no
+    FTS5 support) or its sync triggers are gone, in which case the index no
+    longer follows writes and search falls back to icontains.
+    """
+    table = f'{model._meta.db_table}_fts'
+    key = (connection.settings_dict['NAME'], table)
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            _fts_tables[key] = all(fts_index_state(cursor, model._meta.db_table))
+    return table if _fts_tables[key] else None
+
+
+def fts_trigger_statements(table, columns):
+    """The triggers that keep `table`_fts in sync (as created by migration 0005)."""
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+def repair_search_indexes(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate: SQLite remakes a table for most AlterField / AddField, which
+    drops the FTS5 sync triggers with it. Recreate them, and rebuild the index
+    from the table since it missed every write made in between.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for model_name, columns in SEARCH_FIELDS.items():
+            table = apps.get_model('sales_app', model_name)._meta.db_table
+            has_index, has_triggers = fts_index_state(cursor, table)
+            if not has_index or has_triggers:
+                continue
+            for sql in fts_trigger_statements(table, columns):
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+    _fts_tables.clear()
+
+
+def fts_match(tokens):
+    # every token is a prefix, so 'ahm ali' finds 'Ahmed Ali' while typing
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def fts_ranked_ids(connection, table, queryset, tokens, limit):
+    """ids of the best `limit` FTS5 matches (bm25) among the rows of `queryset`."""
+    sql = f'SELECT rowid FROM {table} WHERE {table} MATCH %s'
+    params = [fts_match(tokens)]
+    if queryset.query.where:
+        # role scoping (or any other filter) applies before the ranking cut
+        scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+        sql += f' AND rowid IN ({scope_sql})'
+        params += scope_params
+    sql += ' ORDER BY rank LIMIT %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def token_filter(tokens, fields):
+    """Every token in at least one field (what the admin's search_fields does)."""
+    condition = Q()
+    for token in tokens:
+        condition &= Q.create([(f'{field}__icontains', token) for field in fields], connector=Q.OR)
+    return condition
+
+
+def search_filter(queryset, term):
+    """`queryset` narrowed to the rows matching `term`, unranked (e.g. for the admin)."""
+    tokens = search_tokens(term)
+    if not tokens:
+        return queryset.none()
+    connection = connections[queryset.db]
+    table = fts_table(connection, queryset.model) if connection.vendor == 'sqlite' else None
+    if table is not None:
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [fts_match(tokens)]))
+    return queryset.filter(token_filter(tokens, SEARCH_FIELDS[queryset.model._meta.model_name]))
+
+
+def search(queryset, term, limit):
+    """
+    The best `limit` rows of `queryset` matching `term`, best first.
+
+    SQLite:     FTS5 prefix query ranked by bm25 (the ranked ids are read from
+                the FTS table, then the rows are loaded through `queryset`).
+    PostgreSQL: icontains per token, served by the trigram GIN indexes and
+                ranked by trigram word similarity.
+    Otherwise (or without FTS5) an unranked icontains scan.
+    """
+    tokens = search_tokens(term)
+    if not tokens:
+        return []
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite':
+        table = fts_table(connection, queryset.model)
+        if table is not None:
+            ids = fts_ranked_ids(connection, table, queryset, tokens, limit)
+            rows = {row.pk: row for row in queryset.filter(pk__in=ids).order_by()}
+            return [rows[pk] for pk in ids if pk in rows]
+
+    fields = SEARCH_FIELDS[queryset.model._meta.model_name]
+    queryset = queryset.filter(token_filter(tokens, fields))
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        similarities = [TrigramWordSimilarity(term, field) for field in fields]
+        rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        return list(queryset.annotate(search_rank=rank).order_by('-search_rank', '-pk')[:limit])
+    return list(queryset.order_by('-pk')[:limit])
+
+
+class SearchMixin:
+    """
+    GET <list-url>?search=<text>
+
+    Ranked, indexed search over SEARCH_FIELDS for as-you-type lookups. Returns
+    one page (`?limit=`, best match first) in the list response shape, with no
+    `next` cursor: refine the text rather than paging through matches.
+    """
+    search_query_param = 'search'
+
+    def list(self, request, *args, **kwargs):
+        term = request.query_params.get(self.search_query_param, '').strip()
+        if not term:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = search(queryset, term, self.paginator.get_page_size(request))
+        serializer = self.get_serializer(rows, many=True)
+        return Response({'next': None, 'results': serializer.data})
@@ -1,32 +1,138 @@
-from rest_framework import serializers
+from rest_framework import permissions, serializers
 from django.contrib.auth import get_user_model
-from .models import Role, Permission, Customer, Product, Invoice, InvoiceProduct
+from django.db import transaction
+from .models import ROLE_CYCLE_MESSAGE, Role, Permission, Customer, Product, Invoice, InvoiceProduct
+from .permissions import permission_matrix, invalidate_roles
+from .stock import live_quantity, live_stock
 
 User = get_user_model()
 AUDIT_FIELDS = ['created_at', 'created_by', 'updated_at', 'updated_by']
 
-class PermissionSerializer(serializers.ModelSerializer):
+
+def parse_field_paths(value):
+    """'id,items.quantity,items.product' -> {'id': {}, 'items': {'quantity': {}, 'product': {}}}"""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=  keep only these fields       (?fields=id,total_amount,items.quantity)
+    ?omit=    drop these fields            (?omit=items,updated_by)
+    ?expand=  embed these related objects  (?expand=customer,items.product)
+
+    Dotted names reach into nested serializers. Applied to safe (read)
+    requests only. The query optimizer plans from the resulting `fields`,
+    so only() and the prefetches shrink with them.
+    """
+    # field name: serializer class embedded in place of the primary key
+    expandable_fields = {}
+
+    def sparse_path(self):
+        path, field = [], self
+        while field is not None:
+            if getattr(field, 'field_name', None):
+                path.append(field.field_name)
+            field = field.parent
+        return path[::-1]
+
+    def sparse_specs(self):
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return None
+        params = getattr(request, 'query_params', request.GET)
+        specs = {name: parse_field_paths(params.get(name)) for name in ('fields', 'omit', 'expand')}
+        for name in self.sparse_path():
+            for key, tree in specs.items():
+                # a nested serializer named without sub-fields is kept whole
+                specs[key] = tree.get(name, {}) if tree else {}
+        return specs
+
+    def get_fields(self):
+        fields = super().get_fields()
+        specs = self.sparse_specs()
+        if not specs:
+            return fields
+
+        for name in specs['expand']:
+            if name in self.expandable_fields and name in fields:
+                fields[name] = self.expandable_fields[name](read_only=True)
+        if specs['fields']:
+            fields = {name: field for name, field in fields.items() if name in specs['fields']}
+        for name, nested in specs['omit'].items():
+            if not nested:
+                fields.pop(name, None)
+        return fields
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'name', 'email']
+
+
+AUDIT_EXPANSIONS = {'created_by': UserSummarySerializer, 'updated_by': UserSummarySerializer}
+
+class PermissionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Permission
         fields = ['id', 'model_name', 'create', 'read', 'update', 'delete']
 
-class RoleSerializer(serializers.ModelSerializer):
+class RoleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     permissions = PermissionSerializer(many=True)
+    expandable_fields = AUDIT_EXPANSIONS
     
     class Meta:
         model = Role
         fields = ['id', 'name', 'parent_role', 'status', 'permissions'] + AUDIT_FIELDS
-        read_only_fields = ['parent_role'] + AUDIT_FIELDS 
+        read_only_fields = ['parent_role'] + AUDIT_FIELDS
 
+    def validate_permissions(self, permissions_data):
+        # model names are stored lower-cased and unique per role
+        seen, repeated = set(), []
+        for perm_data in permissions_data:
+            model_name = (perm_data.get('model_name') or '').lower()
+            if not model_name:
+                continue
+            if model_name in seen and model_name not in repeated:
+                repeated.append(model_name)
+            seen.add(model_name)
+        if repeated:
+            raise serializers.ValidationError(
+                f"Each model may appear only once (case-insensitive); repeated: {', '.join(repeated)}."
+            )
+        return permissions_data
+
+    def validate(self, attrs):
+        # parent_role is read-only here, so the parent is the one already set
+        parent_role = attrs.get('parent_role', getattr(self.instance, 'parent_role', None))
+        if self.instance is not None and self.instance.moves_under_itself(getattr(parent_role, 'pk', None)):
+            raise serializers.ValidationError({'parent_role': [ROLE_CYCLE_MESSAGE]})
+        return attrs
+
+    def _save_permissions(self, role, permissions_data):
+        # bulk_create skips Permission.save() and its signals, so lower-case
+        # the names here and invalidate the matrix explicitly.
+        permissions = [Permission(role=role, **perm_data) for perm_data in permissions_data]
+        for permission in permissions:
+            if permission.model_name:
+                permission.model_name = permission.model_name.lower()
+        Permission.objects.bulk_create(permissions)
+        permission_matrix.invalidate()
+        invalidate_roles([role.pk])
+
+    @transaction.atomic
     def create(self, validated_data):
         permissions_data = validated_data.pop('permissions', [])
         role = Role.objects.create(**validated_data)
-        
-        for perm_data in permissions_data:
-            Permission.objects.create(role=role, **perm_data)
-            
+        self._save_permissions(role, permissions_data)
         return role
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         permissions_data = validated_data.pop('permissions', None)
         
@@ -36,13 +142,13 @@ class RoleSerializer(serializers.ModelSerializer):
 
         if permissions_data is not None:
             instance.permissions.all().delete()
-            for perm_data in permissions_data:
-                Permission.objects.create(role=instance, **perm_data)
+            self._save_permissions(instance, permissions_data)
         
         return instance
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     role_name = serializers.ReadOnlyField(source='role.name')
+    expandable_fields = {'role': RoleSerializer, **AUDIT_EXPANSIONS}
 
     class Meta:
         model = User
@@ -68,29 +174,50 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = AUDIT_EXPANSIONS
+
     class Meta:
         model = Customer
-        fields = '__all__'
+        exclude = ['owner_role']
         read_only_fields = AUDIT_FIELDS
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = AUDIT_EXPANSIONS
+    # quantity is shown from live_quantity when the rows carry it (optimize_queryset)
+    query_annotations = {'live_quantity': live_quantity}
+
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['owner_role']
         read_only_fields = AUDIT_FIELDS
 
-class InvoiceProductSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        if hasattr(instance, 'live_quantity'):  # annotated when loaded; the edit may have moved it
+            instance.live_quantity = live_stock([instance.pk])[instance.pk]
+        return instance
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'quantity' in data and getattr(instance, 'live_quantity', None) is not None:
+            data['quantity'] = instance.live_quantity
+        return data
+
+class InvoiceProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product_name = serializers.ReadOnlyField(source='product.name')
+    expandable_fields = {'product': ProductSerializer, **AUDIT_EXPANSIONS}
+
     class Meta:
         model = InvoiceProduct
         fields = ['id', 'product', 'product_name', 'quantity', 'amount'] + AUDIT_FIELDS
         read_only_fields = ['amount'] + AUDIT_FIELDS
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = InvoiceProductSerializer(many=True, read_only=True)
     customer_name = serializers.ReadOnlyField(source='customer.name')
     created_by_name = serializers.ReadOnlyField(source='created_by.name')
+    expandable_fields = {'customer': CustomerSerializer, **AUDIT_EXPANSIONS}
 
     class Meta:
         model = Invoice
@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+from .models import Customer, Product, Invoice, InvoiceProduct
+from .reporting import invoice_snapshot, record_invoice
+from .catalog import invalidate_catalog
+from .stock import live_quantity, shard_counts, take_sharded_stock, record_movements, unsharded
+from .validators import as_id
+
+
+def merge_invoice_lines(items):
+    """Sum quantities per product id: {product_id: quantity}."""
+    lines = {}
+    for item in items:
+        product_id = int(item['product_id'])
+        lines[product_id] = lines.get(product_id, 0) + int(item['quantity'])
+    return lines
+
+
+@transaction.atomic
+def create_invoice(customer, items, user, products=None):
+    """
+    Set-based invoice creation: the number of queries does not grow with the
+    number of lines. Products are locked in one ordered query (same lock order
+    for every writer, so two invoices cannot deadlock), items are bulk inserted
+    and stock is decremented by a single conditional UPDATE.
+
+    Sharded products (sales_app.stock) are read without a lock and their
+    stock is taken from one StockShard row, so concurrent invoices for a best
+    seller do not queue on its Product row. Every line is appended to the
+    StockMovement ledger.
+
+    `products` ({id: Product}, e.g. InvoiceValidator.products) saves refetching
+    the rows: only id/quantity/price are re-read under the lock.
+    """
+    lines = merge_invoice_lines(items)
+    product_ids = sorted(lines)
+    shards = shard_counts(product_ids)
+    plain_ids = [product_id for product_id in product_ids if product_id not in shards]
+
+    querysets = [
+        queryset for ids, queryset in (
+            (plain_ids, Product.objects.select_for_update().filter(id__in=plain_ids).order_by('id')),
+            (shards, Product.objects.filter(id__in=shards)),
+        ) if ids
+    ]
+    if products is None:
+        products = {pid: product for queryset in querysets for pid, product in queryset.in_bulk().items()}
+        current = {pid: (product.quantity, product.price) for pid, product in products.items()}
+    else:
+        current = {
+            pid: (quantity, price)
+            for queryset in querysets for pid, quantity, price in queryset.values_list('id', 'quantity', 'price')
+        }
+
+    total_amount = 0
+    line_amounts = {}
+    for product_id in product_ids:
+        if product_id not in current or product_id not in products:
+            raise ValueError(f"Product not found: {product_id}")
+        quantity, price = current[product_id]
+        # a sharded product's quantity is its last compacted balance: the shards decide
+        if product_id not in shards and quantity < lines[product_id]:
+            raise ValueError(f"Insufficient stock for product: {products[product_id].name}")
+        line_amounts[product_id] = price * lines[product_id]
+        total_amount += line_amounts[product_id]
+
+    invoice = Invoice.objects.create(
+        customer=customer,
+        created_by=user,
+        status='pending',  # Default status is pending
+        total_amount=total_amount
+    )
+
+    InvoiceProduct.objects.bulk_create([
+        InvoiceProduct(
+            invoice=invoice,
+            product_id=product_id,
+            quantity=lines[product_id],
+            amount=line_amounts[product_id],
+            created_by=user,
+            owner_role_id=invoice.owner_role_id
+        )
+        for product_id in product_ids
+    ])
+
+    if plain_ids:
+        # Each row is only decremented while it still has enough stock (and
+        # was not sharded meanwhile); a short row count means another writer
+        # got there first, so roll everything back.
+        enough_stock = Q()
+        for product_id in plain_ids:
+            enough_stock |= Q(id=product_id, quantity__gte=lines[product_id])
+        updated = Product.objects.filter(enough_stock).filter(unsharded()).update(
+            quantity=Case(*[When(id=product_id, then=F('quantity') - lines[product_id]) for product_id in plain_ids]),
+            updated_at=timezone.now()
+        )
+        if updated != len(plain_ids):
+            raise ValueError("Insufficient stock, please retry.")
+    if shards:
+        take_sharded_stock(
+            {product_id: lines[product_id] for product_id in shards}, shards,
+            {product_id: products[product_id].name for product_id in shards}
+        )
+    invalidate_catalog(Product)  # stock changed; update() sends no signals
+    record_movements({product_id: -lines[product_id] for product_id in product_ids}, 'sale', user, invoice)
+
+    record_invoice(
+        invoice_snapshot(invoice),
+        [(product_id, lines[product_id], line_amounts[product_id]) for product_id in product_ids]
+    )
+    return invoice
+
+
+def load_invoice_lookups(payloads):
+    """
+    Fetch every product and customer referenced by a batch of invoice payloads
+    in two queries, as {id: obj} dicts for InvoiceValidator and create_invoice.
+    """
+    product_ids, customer_ids = set(), set()
+    for data in payloads:
+        if not isinstance(data, dict):
+            continue
+        customer_ids.add(as_id(data.get('customer_id')))
+        items = data.get('items')
+        if isinstance(items, list):
+            product_ids.update(as_id(item.get('product_id')) for item in items if isinstance(item, dict))
+    product_ids.discard(None)
+    customer_ids.discard(None)
+    products = Product.objects.annotate(live_quantity=live_quantity()).in_bulk(product_ids)
+    return products, Customer.objects.in_bulk(customer_ids)
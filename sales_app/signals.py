@@ -0,0 +1,137 @@
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import ROLE_CYCLE_MESSAGE, BaseModel, SalesSummary, User, Role, RoleClosure, Permission, Product, Customer, StockShard
+from .permissions import permission_matrix, invalidate_roles
+from .authentication import invalidate_user
+from .catalog import invalidate_catalog
+from .stock import adjust_sharded_stock, record_movements
+
+
+# ---------------------------------------------------------
+# Role hierarchy (closure table sync)
+# ---------------------------------------------------------
+@receiver(pre_save, sender=Role)
+def prevent_role_cycles(sender, instance, raw=False, **kwargs):
+    # last line of defence; Role.clean() and RoleSerializer reject this first
+    if not raw and instance.moves_under_itself(instance.parent_role_id):
+        raise ValidationError({'parent_role': ROLE_CYCLE_MESSAGE})
+
+
+@receiver(post_save, sender=Role)
+def sync_role_closure(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        current_parent_id = RoleClosure.objects.filter(
+            descendant=instance, depth=1
+        ).values_list('ancestor_id', flat=True).first()
+        if current_parent_id == instance.parent_role_id:
+            invalidate_roles([instance.pk])
+            return
+        invalidate_roles(RoleClosure.objects.filter(descendant=instance).values_list('ancestor_id', flat=True))
+        RoleClosure.objects.detach(instance)
+    RoleClosure.objects.attach(instance)
+    invalidate_roles(RoleClosure.objects.filter(descendant=instance).values_list('ancestor_id', flat=True))
+
+
+@receiver(pre_delete, sender=Role)
+def detach_deleted_role(sender, instance, **kwargs):
+    # Child roles get parent_role=NULL through SET_NULL, so their subtrees
+    # become roots; the role's own rows go away through CASCADE.
+    invalidate_roles(RoleClosure.objects.filter(descendant=instance).values_list('ancestor_id', flat=True))
+    RoleClosure.objects.detach(instance)
+
+
+# ---------------------------------------------------------
+# Permission matrix cache
+# ---------------------------------------------------------
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_permission_matrix(sender, **kwargs):
+    permission_matrix.invalidate()
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permission_role(sender, instance, **kwargs):
+    if instance.role_id:
+        invalidate_roles([instance.role_id])
+
+
+# ---------------------------------------------------------
+# Authenticated-user cache (role changes bump role_version above)
+# ---------------------------------------------------------
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+# ---------------------------------------------------------
+# Catalog response cache (queryset.update() callers invalidate explicitly)
+# ---------------------------------------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_catalog_cache(sender, **kwargs):
+    invalidate_catalog(sender)
+
+
+# ---------------------------------------------------------
+# Stock ledger (saves through the API / admin; invoices write it directly)
+# ---------------------------------------------------------
+@receiver(pre_save, sender=Product)
+def remember_saved_quantity(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    instance._saved_quantity = Product.objects.filter(pk=instance.pk).values_list('quantity', flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+def record_stock_adjustment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = 0 if created else instance.__dict__.pop('_saved_quantity', None)
+    if before is None or instance.quantity is None or instance.quantity == before:
+        return
+    delta = instance.quantity - before
+    user = instance.created_by if created else instance.updated_by
+    if not created and StockShard.objects.filter(product=instance).exists():
+        # the edit was made against the compacted balance: apply it as a delta to the shards
+        adjust_sharded_stock(instance.pk, delta, user)
+        # the stored balance is the shards' total, not the value submitted
+        instance.refresh_from_db(fields=['quantity'])
+    else:
+        record_movements({instance.pk: delta}, 'adjustment', user)
+
+
+# ---------------------------------------------------------
+# owner_role (the creator's role, denormalized on every BaseModel row)
+# ---------------------------------------------------------
+@receiver(pre_save, sender=User)
+def remember_saved_role(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.pk or (update_fields is not None and 'role' not in update_fields):
+        return
+    instance._saved_role_id = User.objects.filter(pk=instance.pk).values_list('role_id', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def move_owned_rows(sender, instance, created, raw=False, **kwargs):
+    if '_saved_role_id' not in instance.__dict__:
+        return
+    if instance.__dict__.pop('_saved_role_id') == instance.role_id:
+        return
+    # the summaries count each invoice under (owner_role, creator): move them
+    # along, or later deltas would land in the new role's buckets only
+    with transaction.atomic():
+        for model in apps.get_app_config('sales_app').get_models():
+            if issubclass(model, BaseModel):
+                model.objects.filter(created_by=instance).update(owner_role_id=instance.role_id)
+            elif issubclass(model, SalesSummary):
+                model.objects.filter(user=instance).update(role_id=instance.role_id)
@@ -0,0 +1,139 @@
+import random
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Product, StockMovement, StockShard
+
+
+def split_evenly(total, count):
+    """[q0, q1, ...] summing to `total`, differing by at most one."""
+    base, extra = divmod(max(total, 0), count)
+    return [base + (1 if index < extra else 0) for index in range(count)]
+
+
+def shard_counts(product_ids):
+    """{product_id: number of shards} for the sharded products among `product_ids`."""
+    return dict(
+        StockShard.objects.filter(product_id__in=product_ids).values('product_id')
+        .annotate(count=Count('id')).values_list('product_id', 'count')
+    )
+
+
+def unsharded():
+    """Filter for Product rows whose stock is still kept in Product.quantity."""
+    return ~Exists(StockShard.objects.filter(product=OuterRef('pk')))
+
+
+def take_sharded_stock(lines, counts, names):
+    """
+    Decrement sharded stock for {product_id: quantity}, in product id order
+    (`counts` as returned by shard_counts).
+
+    Fast path: one conditional UPDATE on a random shard that holds enough, so
+    concurrent invoices for the same product lock different rows. When that
+    shard is short, every shard of the product is locked (in shard order) and
+    the quantity is taken from as many as needed. Raises ValueError when the
+    shards together hold less than asked.
+    """
+    for product_id in sorted(lines):
+        quantity = lines[product_id]
+        shards = StockShard.objects.filter(product_id=product_id)
+        taken = shards.filter(shard=random.randrange(counts[product_id]), quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity
+        )
+        if taken:
+            continue
+
+        locked = list(shards.select_for_update().order_by('shard').values_list('id', 'quantity'))
+        if not locked:
+            raise ValueError("Stock was compacted concurrently, please retry.")
+        if sum(available for _, available in locked) < quantity:
+            raise ValueError(f"Insufficient stock for product: {names[product_id]}")
+        remaining, updates = quantity, {}
+        for shard_id, available in sorted(locked, key=lambda row: -row[1]):
+            updates[shard_id] = min(available, remaining)
+            remaining -= updates[shard_id]
+            if not remaining:
+                break
+        StockShard.objects.filter(id__in=updates).update(
+            quantity=Case(*[When(id=shard_id, then=F('quantity') - used) for shard_id, used in updates.items()])
+        )
+
+
+def record_movements(lines, reason, user=None, invoice=None):
+    """Append ledger rows for {product_id: signed quantity}."""
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, quantity=quantity, reason=reason, invoice=invoice, created_by=user)
+        for product_id, quantity in sorted(lines.items())
+        if quantity
+    ])
+
+
+@transaction.atomic
+def adjust_sharded_stock(product_id, delta, user=None):
+    """
+    Add `delta` (e.g. a restock) to a sharded product and refresh its
+    balance. Stock never goes below zero: the applied delta is returned.
+    """
+    product = Product.objects.select_for_update().get(pk=product_id)
+    shards = list(StockShard.objects.select_for_update().filter(product=product).order_by('shard'))
+    current = sum(shard.quantity for shard in shards)
+    delta = max(delta, -current)
+    rebalance(product, shards, current + delta)
+    record_movements({product.pk: delta}, 'adjustment', user)
+    return delta
+
+
+@transaction.atomic
+def compact_product_stock(product_id, shards=None):
+    """
+    Fold a product's shards back into Product.quantity (the compacted
+    balance) and spread the stock evenly again over `shards` rows (default:
+    the current count), so the fast path keeps finding a shard with enough.
+    shards=0 unshards the product: its stock goes back to Product.quantity.
+
+    Locks the Product row, then the shards, like adjust_sharded_stock;
+    invoices never lock the row of a sharded product.
+    """
+    product = Product.objects.select_for_update().get(pk=product_id)
+    current = list(StockShard.objects.select_for_update().filter(product=product).order_by('shard'))
+    total = sum(shard.quantity for shard in current) if current else (product.quantity or 0)
+    rebalance(product, current, total, len(current) if shards is None else shards)
+    return total
+
+
+def rebalance(product, shards, total, count=None):
+    count = len(shards) if count is None else count
+    quantities = split_evenly(total, count) if count else []
+    StockShard.objects.filter(product=product, shard__gte=count).delete()
+    existing = {shard.shard: shard for shard in shards if shard.shard < count}
+    for index, quantity in enumerate(quantities):
+        if index in existing:
+            existing[index].quantity = quantity
+        else:
+            existing[index] = StockShard(product=product, shard=index, quantity=quantity)
+    StockShard.objects.bulk_update([shard for shard in existing.values() if shard.pk], ['quantity'])
+    StockShard.objects.bulk_create([shard for shard in existing.values() if not shard.pk])
+    Product.objects.filter(pk=product.pk).update(quantity=total, updated_at=timezone.now())
+
+
+def live_quantity():
+    """
+    Expression for the stock a product really has: the shards' total for a
+    sharded product (Product.quantity is only its last compacted balance),
+    Product.quantity otherwise. Annotate it wherever stock is shown or checked.
+    """
+    shard_total = (
+        StockShard.objects.filter(product=OuterRef('pk')).order_by()
+        .values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    return Coalesce(Subquery(shard_total), F('quantity'))
+
+
+def live_stock(product_ids):
+    """{product_id: available} with sharded products summed from their shards."""
+    return dict(
+        Product.objects.filter(id__in=product_ids)
+        .annotate(available=live_quantity()).values_list('id', 'available')
+    )
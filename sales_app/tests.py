@@ -1,3 +1,1131 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import ForcedAuthentication, Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .admin import DateHierarchyQuerySet, InvoiceProductInline
+from .authentication import CachedJWTAuthentication, PermissionClaimsRefreshToken
+from .cache import get_version, new_version
+from .models import (
+    Role, Permission, User, Customer, Product, Invoice, InvoiceProduct, RoleClosure, DailySalesSummary,
+    DailyCustomerSales, DailyProductSales, StockMovement, StockShard, VersionToken
+)
+from .serializers import RoleSerializer
+from .services import create_invoice
+from .validators import CustomerValidator, InvoiceValidator, UserValidator
+from .metrics import MetricsMiddleware, registry
+from .pagination import EstimatedCountPaginator
+from .permissions import (
+    PERMISSION_BITS, DynamicHierarchicalPermission, get_auth_context, invalidate_roles, permission_matrix, role_version
+)
+from .renderers import FastJSONRenderer, FastJSONParser, orjson
+from .search import fts_table, search
+from .stock import compact_product_stock, live_stock
 
-# Create your tests here.
+
+# version tokens are re-read from the database once their TTL runs out; a long
+# TTL keeps that re-read out of the query counts of slow tests
+@override_settings(SALES_VERSION_TOKEN_TTL=60)
+class SalesAPITestCase(TestCase):
+    def setUp(self):
+        self.admin_role = Role.objects.create(name='Admin')
+        self.manager_role = Role.objects.create(name='Sales Manager 1', parent_role=self.admin_role)
+        self.employee_role = Role.objects.create(name='Sales Employee 1', parent_role=self.manager_role)
+        for model_name in ['user', 'role', 'permission', 'customer', 'product', 'invoice', 'invoiceproduct']:
+            Permission.objects.create(role=self.manager_role, model_name=model_name, create=True, read=True, update=True)
+            Permission.objects.create(role=self.employee_role, model_name=model_name, create=True, read=True)
+
+        self.admin = self.create_user('admin', self.admin_role)
+        self.manager = self.create_user('manager', self.manager_role)
+        self.employee = self.create_user('employee', self.employee_role)
+
+        self.customer = Customer.objects.create(name='Customer', email='customer@test.com', mobile='0100', created_by=self.admin)
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price='2.50', quantity=1000, created_by=self.admin)
+            for i in range(5)
+        ]
+
+    def create_user(self, name, role):
+        return User.objects.create_user(
+            username=name, email=f'{name}@test.com', password='secret123', name=name, role=role
+        )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def create_invoice(self, user, lines=2):
+        invoice = Invoice.objects.create(customer=self.customer, created_by=user, total_amount=0)
+        for product in self.products[:lines]:
+            InvoiceProduct.objects.create(invoice=invoice, product=product, quantity=1, amount=product.price, created_by=user)
+        return invoice
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries.captured_queries)
+
+
+class QueryOptimizationTests(SalesAPITestCase):
+    def test_invoice_list_uses_constant_queries(self):
+        client = self.client_for(self.manager)
+        self.create_invoice(self.employee, lines=1)
+        self.count_queries(client, '/api/invoices/')  # warm the permission cache
+        baseline = self.count_queries(client, '/api/invoices/')
+
+        for _ in range(5):
+            self.create_invoice(self.employee, lines=5)
+        self.assertEqual(self.count_queries(client, '/api/invoices/'), baseline)
+
+    def test_invoice_retrieve_uses_constant_queries(self):
+        client = self.client_for(self.manager)
+        small = self.create_invoice(self.employee, lines=1)
+        large = self.create_invoice(self.employee, lines=5)
+        self.count_queries(client, f'/api/invoices/{small.id}/')
+        self.assertEqual(
+            self.count_queries(client, f'/api/invoices/{small.id}/'),
+            self.count_queries(client, f'/api/invoices/{large.id}/')
+        )
+
+    def test_invoice_create_uses_constant_queries(self):
+        client = self.client_for(self.employee)
+        products = self.products + [
+            Product.objects.create(name=f'Bulk {index}', price=Decimal('1.00'), quantity=100, created_by=self.admin)
+            for index in range(35)
+        ]
+
+        def post(lines):
+            items = [{'product_id': product.id, 'quantity': 1} for product in products[:lines]]
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post('/api/invoices/', {'customer_id': self.customer.id, 'items': items}, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(len(response.json()['items']), lines)
+            return [query['sql'] for query in queries.captured_queries]
+
+        # warms the permission cache and creates today's per-product rollup rows: a sale of a
+        # product with no row yet adds one batched INSERT to the rollup UPDATE, whatever the line count
+        post(40)
+        small, large = post(2), post(40)
+        self.assertEqual(len(small), len(large), '\n'.join(large))
+
+    def test_user_and_role_lists_use_constant_queries(self):
+        client = self.client_for(self.admin)
+        for index, url in enumerate(['/api/users/', '/api/roles/']):
+            self.count_queries(client, url)
+            baseline = self.count_queries(client, url)
+            role = Role.objects.create(name=f'Extra {url}', parent_role=self.employee_role)
+            Permission.objects.create(role=role, model_name='invoice', read=True)
+            self.create_user(f'extra{index}', role)
+            self.count_queries(client, url)
+            self.assertEqual(self.count_queries(client, url), baseline)
+
+
+class SparseFieldsTests(SalesAPITestCase):
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.admin).get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), [query['sql'] for query in queries.captured_queries]
+
+    def test_fields_narrow_columns_and_skip_items(self):
+        self.create_invoice(self.employee, lines=2)
+        data, queries = self.get('/api/invoices/?fields=id,total_amount')
+        self.assertEqual(set(data['results'][0]), {'id', 'total_amount'})
+        self.assertFalse(any('sales_app_invoiceproduct' in sql for sql in queries))
+        invoice_sql = next(sql for sql in queries if 'FROM "sales_app_invoice"' in sql)
+        self.assertNotIn('"sales_app_invoice"."status"', invoice_sql)
+
+    def test_nested_fields_and_omit(self):
+        self.create_invoice(self.employee, lines=2)
+        data, _ = self.get('/api/invoices/?fields=id,items.quantity')
+        self.assertEqual(data['results'][0]['items'], [{'quantity': 1}, {'quantity': 1}])
+
+        data, queries = self.get('/api/invoices/?omit=items,updated_by')
+        self.assertNotIn('items', data['results'][0])
+        self.assertNotIn('updated_by', data['results'][0])
+        self.assertIn('customer_name', data['results'][0])
+        self.assertFalse(any('sales_app_invoiceproduct' in sql for sql in queries))
+
+    def test_expand_embeds_related_objects_without_extra_queries(self):
+        url = '/api/invoices/?expand=customer,items.product'
+        self.create_invoice(self.employee, lines=1)
+        self.get(url)  # warm the permission cache
+        _, baseline = self.get(url)
+        for _ in range(3):
+            self.create_invoice(self.employee, lines=3)
+        data, queries = self.get(url)
+        self.assertEqual(len(queries), len(baseline))
+
+        invoice = data['results'][0]
+        self.assertEqual(invoice['customer']['email'], 'customer@test.com')
+        self.assertEqual(invoice['items'][0]['product']['price'], '2.50')
+
+    def test_writes_ignore_sparse_parameters(self):
+        response = self.client_for(self.admin).post(
+            '/api/products/?fields=id', {'name': 'Sparse', 'price': '1.00', 'quantity': 5}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['name'], 'Sparse')
+
+
+class CatalogCacheTests(SalesAPITestCase):
+    def get(self, client, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, headers=headers)
+        return response, len(queries.captured_queries)
+
+    def test_unchanged_list_is_not_modified_without_queries(self):
+        client = self.client_for(self.employee)
+        first, _ = self.get(client, '/api/products/')
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Last-Modified', first)
+
+        response, queries = self.get(client, '/api/products/', **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, 0)
+
+        response, queries = self.get(client, '/api/products/')
+        self.assertEqual((response.status_code, queries), (200, 0))
+        self.assertEqual(response.json(), first.json())
+
+    def test_invoice_stock_change_invalidates(self):
+        client = self.client_for(self.employee)
+        first, _ = self.get(client, '/api/products/')
+        product = self.products[0]
+        create_invoice(self.customer, [{'product_id': product.id, 'quantity': 3}], self.employee)
+
+        response, _ = self.get(client, '/api/products/', **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        quantities = {row['id']: row['quantity'] for row in response.json()['results']}
+        self.assertEqual(quantities[product.id], 997)
+
+    def test_if_modified_since_does_not_hide_a_same_second_change(self):
+        client = self.client_for(self.employee)
+        first, _ = self.get(client, '/api/products/')
+        create_invoice(self.customer, [{'product_id': self.products[0].id, 'quantity': 3}], self.employee)
+        response, _ = self.get(client, '/api/products/', **{'If-Modified-Since': http_date(time.time() + 60)})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_customer_write_invalidates_retrieve(self):
+        client = self.client_for(self.admin)
+        url = f'/api/customers/{self.customer.id}/'
+        first, _ = self.get(client, url)
+        self.assertEqual(self.get(client, url, **{'If-None-Match': first['ETag']})[0].status_code, 304)
+
+        self.customer.name = 'Renamed'
+        self.customer.save()
+        response, _ = self.get(client, url, **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Renamed')
+
+
+class StockLedgerTests(SalesAPITestCase):
+    def sell(self, product, quantity):
+        return create_invoice(self.customer, [{'product_id': product.id, 'quantity': quantity}], self.employee)
+
+    def test_sales_are_appended_to_the_ledger(self):
+        invoice = self.sell(self.products[0], 4)
+        movement = StockMovement.objects.get(reason='sale')
+        self.assertEqual((movement.product_id, movement.quantity, movement.invoice_id), (self.products[0].id, -4, invoice.id))
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity, 996)
+
+    def test_sharded_stock_leaves_the_product_row_alone(self):
+        product = self.products[0]
+        self.assertEqual(compact_product_stock(product.pk, shards=4), 1000)
+        self.assertEqual(list(StockShard.objects.filter(product=product).values_list('quantity', flat=True)), [250] * 4)
+
+        self.sell(product, 3)
+        self.sell(product, 400)  # more than any one shard holds
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 1000)
+        self.assertEqual(live_stock([product.pk])[product.pk], 597)
+        with self.assertRaises(ValueError):
+            self.sell(product, 598)
+        self.assertEqual(Invoice.objects.count(), 2)
+
+        compact_product_stock(product.pk)
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 597)
+        self.assertEqual(
+            sum(StockMovement.objects.filter(product=product).values_list('quantity', flat=True)), 597
+        )
+
+    def test_sharded_stock_is_shown_and_checked_as_the_live_total(self):
+        product = self.products[0]
+        compact_product_stock(product.pk, shards=4)
+        client = self.client_for(self.employee)
+        first = client.get('/api/products/')
+        self.sell(product, 300)
+
+        response = client.get('/api/products/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        quantities = {row['id']: row['quantity'] for row in response.json()['results']}
+        self.assertEqual(quantities[product.id], 700)
+        admin_client = self.client_for(self.admin)
+        self.assertEqual(admin_client.get(f'/api/products/{product.id}/').json()['quantity'], 700)
+        export = b''.join(client.get('/api/products/export/?type=ndjson').streaming_content).decode()
+        exported = {row['id']: row['quantity'] for row in map(json.loads, export.splitlines())}
+        self.assertEqual(exported[product.id], 700)
+
+        validator = InvoiceValidator({'customer_id': self.customer.id, 'items': [{'product_id': product.id, 'quantity': 701}]})
+        self.assertFalse(validator.is_valid())
+        self.assertEqual(validator.errors, {'item_0': [f'Not enough quantity for {product.name}. Available: 700']})
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 1000)  # the compacted balance is untouched
+
+    def test_edit_of_sharded_stock_applies_as_delta(self):
+        product = self.products[0]
+        compact_product_stock(product.pk, shards=2)
+        self.sell(product, 100)
+        response = self.client_for(self.admin).put(
+            f'/api/products/{product.id}/', {'name': product.name, 'price': '2.50', 'quantity': 1050}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['quantity'], 950)
+        # +50 against the compacted 1000, on top of the 900 really left
+        self.assertEqual(live_stock([product.pk])[product.pk], 950)
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 950)
+
+    def test_unshard_returns_stock_to_the_product_row(self):
+        product = self.products[0]
+        compact_product_stock(product.pk, shards=2)
+        self.sell(product, 10)
+        compact_product_stock(product.pk, shards=0)
+        self.assertFalse(StockShard.objects.filter(product=product).exists())
+        self.sell(product, 10)
+        self.assertEqual(Product.objects.get(pk=product.pk).quantity, 980)
+
+
+class OwnerRoleScopingTests(SalesAPITestCase):
+    def list_ids(self, user):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client_for(user).get('/api/invoices/')
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.data['results']}, queries
+
+    def test_scoping_filters_on_owner_role_without_join(self):
+        employee_invoice = create_invoice(self.customer, [{'product_id': self.products[0].id, 'quantity': 1}], self.employee)
+        manager_invoice = self.create_invoice(self.manager)
+        self.assertEqual(employee_invoice.owner_role_id, self.employee_role.id)
+        self.assertEqual(InvoiceProduct.objects.get(invoice=employee_invoice).owner_role_id, self.employee_role.id)
+
+        ids, queries = self.list_ids(self.manager)
+        self.assertEqual(ids, {employee_invoice.id, manager_invoice.id})
+        page_sql = next(q['sql'] for q in queries.captured_queries if 'FROM "sales_app_invoice"' in q['sql'])
+        self.assertIn('"owner_role_id" IN', page_sql)
+        self.assertNotIn('DISTINCT', page_sql)
+        self.assertNotIn('INNER JOIN', page_sql)  # the LEFT JOIN to User is select_related, not scoping
+
+        self.assertEqual(self.list_ids(self.employee)[0], {employee_invoice.id})
+
+    def test_role_change_moves_owned_rows(self):
+        invoice = self.create_invoice(self.employee)
+        self.employee.role = self.manager_role
+        self.employee.save()
+        self.assertEqual(Invoice.objects.get(pk=invoice.pk).owner_role_id, self.manager_role.id)
+        self.assertEqual(
+            set(InvoiceProduct.objects.filter(invoice=invoice).values_list('owner_role_id', flat=True)),
+            {self.manager_role.id}
+        )
+        self.assertEqual(self.list_ids(self.manager)[0], set())
+        self.assertEqual(self.list_ids(self.admin)[0], {invoice.id})
+
+
+class PermissionMatrixTests(SalesAPITestCase):
+    def test_revocation_on_another_worker_applies_after_the_token_ttl(self):
+        self.assertTrue(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'create'))
+        # what another worker's revocation leaves behind: the rows and a new token in the database
+        Permission.objects.filter(role=self.employee_role, model_name='invoice').update(create=False)
+        VersionToken.objects.filter(key=permission_matrix.version_key).update(version=new_version())
+
+        self.assertTrue(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'create'))
+        with override_settings(SALES_VERSION_TOKEN_TTL=0):
+            self.assertFalse(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'create'))
+
+    def test_warm_checks_run_without_queries(self):
+        permission_matrix.has_permission(self.employee_role.id, 'invoice', 'read')
+        with self.assertNumQueries(0):
+            self.assertTrue(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'create'))
+            self.assertFalse(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'delete'))
+            self.assertEqual(permission_matrix.child_role_ids(self.admin_role.id), {self.manager_role.id, self.employee_role.id})
+            self.assertEqual(permission_matrix.role_name(self.manager_role.id), self.manager_role.name.lower())
+
+    def test_role_serializer_update_invalidates(self):
+        self.assertTrue(permission_matrix.has_permission(self.manager_role.id, 'invoice', 'update'))
+        serializer = RoleSerializer(self.manager_role, data={
+            'name': 'Supervisor', 'permissions': [{'model_name': 'Invoice', 'read': True}],
+        }, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertFalse(permission_matrix.has_permission(self.manager_role.id, 'invoice', 'update'))
+        self.assertTrue(permission_matrix.has_permission(self.manager_role.id, 'invoice', 'read'))
+        self.assertEqual(permission_matrix.role_permissions(self.manager_role.id), {'invoice': PERMISSION_BITS['read']})
+        self.assertEqual(permission_matrix.role_name(self.manager_role.id), 'supervisor')
+
+    def test_permission_save_and_delete_invalidate(self):
+        permission = Permission.objects.get(role=self.employee_role, model_name='invoice')
+        self.assertFalse(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'update'))
+        permission.update = True
+        permission.save()
+        self.assertTrue(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'update'))
+        # the `delete` field shadows Model.delete(); the queryset delete still sends the signals
+        Permission.objects.filter(pk=permission.pk).delete()
+        self.assertFalse(permission_matrix.has_permission(self.employee_role.id, 'invoice', 'read'))
+
+    def test_reparenting_invalidates(self):
+        self.assertIn(self.employee_role.id, permission_matrix.child_role_ids(self.manager_role.id))
+        self.employee_role.parent_role = self.admin_role
+        self.employee_role.save()
+        self.assertNotIn(self.employee_role.id, permission_matrix.child_role_ids(self.manager_role.id))
+        self.assertIn(self.employee_role.id, permission_matrix.child_role_ids(self.admin_role.id))
+
+    def test_shared_token_is_bumped_after_commit(self):
+        key = permission_matrix.version_key
+        VersionToken.objects.update_or_create(key=key, defaults={'version': 'shared'})
+        with self.captureOnCommitCallbacks(execute=True):
+            permission_matrix.invalidate()
+            self.assertNotEqual(get_version(key), 'shared')
+            self.assertEqual(VersionToken.objects.get(key=key).version, 'shared')
+        self.assertNotEqual(VersionToken.objects.get(key=key).version, 'shared')
+
+
+class AuthContextTests(SalesAPITestCase):
+    def request_for(self, user):
+        return Request(APIRequestFactory().get('/'), authenticators=[ForcedAuthentication(user, None)])
+
+    def test_object_checks_run_without_queries(self):
+        own, child, parent = (self.create_invoice(user, lines=0) for user in (self.manager, self.employee, self.admin))
+        invoices = list(Invoice.objects.filter(pk__in=[own.pk, child.pk, parent.pk]).order_by('pk'))
+        request = self.request_for(self.manager)
+        permission = DynamicHierarchicalPermission()
+        get_auth_context(request)
+
+        with self.assertNumQueries(0):
+            allowed = [permission.has_object_permission(request, None, invoice) for invoice in invoices]
+            allowed.append(permission.has_object_permission(request, None, self.employee))
+            allowed.append(permission.has_object_permission(request, None, self.admin))
+        self.assertEqual(allowed, [True, True, False, True, False])
+        self.assertIs(get_auth_context(request), get_auth_context(request))
+
+    def test_status_change_reads_the_role_name_from_the_context(self):
+        cashier_role = Role.objects.create(name='Cashier', parent_role=self.manager_role)
+        Permission.objects.create(role=cashier_role, model_name='invoice', read=True, update=True)
+        cashier = self.create_user('cashier', cashier_role)
+        invoice = self.create_invoice(cashier, lines=0)
+
+        response = self.client_for(cashier).patch(f'/api/invoices/{invoice.id}/', {'status': 'paid'}, format='json')
+        self.assertEqual(response.status_code, 403, response.content)
+        response = self.client_for(self.manager).patch(f'/api/invoices/{invoice.id}/', {'status': 'paid'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class SearchTests(SalesAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for name, email, mobile in [
+            ('Ahmed Ali', 'ahmed.ali@shop.com', '01011112222'),
+            ('Ahmed Hassan', 'a.hassan@shop.com', '01233334444'),
+            ('Mona Ahmed', 'mona@shop.com', '01555556666'),
+        ]:
+            Customer.objects.create(name=name, email=email, mobile=mobile, created_by=self.employee)
+
+    def search_names(self, user, url, term):
+        response = self.client_for(user).get(url, {'search': term})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIsNone(response.json()['next'])
+        return [row['name'] for row in response.json()['results']]
+
+    def test_prefix_search_on_name_email_and_mobile(self):
+        self.assertEqual(self.search_names(self.employee, '/api/customers/', 'ahmed al'), ['Ahmed Ali'])
+        self.assertEqual(set(self.search_names(self.employee, '/api/customers/', 'ahm')),
+                         {'Ahmed Ali', 'Ahmed Hassan', 'Mona Ahmed'})
+        self.assertEqual(self.search_names(self.employee, '/api/customers/', 'a.hass'), ['Ahmed Hassan'])
+        self.assertEqual(self.search_names(self.employee, '/api/customers/', '0155'), ['Mona Ahmed'])
+        self.assertEqual(self.search_names(self.employee, '/api/products/', 'product 3'), ['Product 3'])
+
+    def test_index_follows_writes(self):
+        customer = Customer.objects.get(name='Mona Ahmed')
+        customer.name = 'Mona Kamal'
+        customer.save()
+        self.assertEqual(self.search_names(self.manager, '/api/customers/', 'kamal'), ['Mona Kamal'])
+        customer.delete()
+        self.assertEqual(self.search_names(self.manager, '/api/customers/', 'kamal'), [])
+
+    def test_scoping_applies_before_the_limit(self):
+        Customer.objects.create(name='Ahmed Other', created_by=self.admin)
+        rows = search(Customer.objects.filter(created_by=self.admin), 'ahmed', limit=1)
+        self.assertEqual([row.name for row in rows], ['Ahmed Other'])
+
+    def test_requires_read_permission(self):
+        cashier = self.create_user('cashier', Role.objects.create(name='Cashier 1', parent_role=self.employee_role))
+        response = self.client_for(cashier).get('/api/customers/', {'search': 'ahmed'})
+        self.assertEqual(response.status_code, 403)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite remakes tables for schema changes')
+class SearchIndexRemakeTests(TransactionTestCase):
+    def test_edits_after_a_table_remake_are_found(self):
+        customer = Customer.objects.create(name='Mona Ahmed', email='mona@shop.com', mobile='01555556666')
+        # what an AlterField / AddField migration does on SQLite: the FTS sync triggers go with the old table
+        with connection.schema_editor() as editor:
+            editor._remake_table(Customer)
+        customer.name = 'Mona Kamal'
+        customer.save()
+
+        call_command('migrate', verbosity=0)
+        self.assertEqual(fts_table(connection, Customer), 'sales_app_customer_fts')
+        self.assertEqual([row.name for row in search(Customer.objects.all(), 'kamal', 10)], ['Mona Kamal'])
+        customer.name = 'Mona Samir'
+        customer.save()
+        self.assertEqual([row.name for row in search(Customer.objects.all(), 'samir', 10)], ['Mona Samir'])
+        self.assertEqual(search(Customer.objects.all(), 'kamal', 10), [])
+
+
+class MetricsTests(SalesAPITestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_route_metrics_are_exposed(self):
+        self.create_invoice(self.employee, lines=2)
+        client = self.client_for(self.manager)
+        self.assertEqual(client.get('/api/invoices/').status_code, 200)
+
+        body = self.client.get('/metrics').content.decode()
+        labels = 'action="list",method="GET",route="invoice-list"'
+        self.assertIn(f'sales_requests_total{{{labels},status="2xx"}} 1', body)
+        self.assertIn(f'sales_request_duration_seconds_count{{{labels}}} 1', body)
+        self.assertIn(f'sales_request_rows_serialized_total{{{labels}}} 1', body)
+        self.assertRegex(body, rf'sales_request_queries_sum{{{labels}}} [1-9]')
+
+    @override_settings(SALES_SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_route_and_role(self):
+        client = self.client_for(self.manager)
+        with self.assertLogs('sales_app.slow_queries', 'WARNING') as logs:
+            client.get('/api/invoices/')
+        self.assertTrue(any(
+            f'route=invoice-list action=list role_id={self.manager_role.id}' in line for line in logs.output
+        ))
+
+    async def test_async_requests_count_the_orm_thread_queries(self):
+        async def view(request):
+            pass
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(view)))
+
+        await sync_to_async(self.create_invoice)(self.employee, lines=2)
+        token = await sync_to_async(RefreshToken.for_user)(self.manager)
+        response = await self.async_client.get('/api/async/invoices/', headers={'Authorization': f'Bearer {token.access_token}'})
+        self.assertEqual(response.status_code, 200)
+
+        body = registry.render()
+        labels = 'action="",method="GET",route="async-invoice-list"'
+        self.assertIn(f'sales_request_duration_seconds_count{{{labels}}} 1', body)
+        self.assertRegex(body, rf'sales_request_queries_sum{{{labels}}} [1-9]')
+
+    @override_settings(SALES_METRICS_TOKEN='scrape-secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+
+
+class SeedDataTests(TestCase):
+    def test_seeds_role_tree_and_consistent_invoices(self):
+        call_command(
+            'seed_sales_data', managers=2, employees_per_manager=2, cashiers_per_employee=2,
+            users_per_role=2, customers=20, products=10, invoices=50, batch_size=16, stdout=StringIO()
+        )
+        self.assertEqual(Role.objects.count(), 1 + 2 + 4 + 8)
+        self.assertEqual(User.objects.count(), 15 * 2)
+        self.assertEqual(Invoice.objects.count(), 50)
+        cashier = Role.objects.get(name='Cashier 1')
+        self.assertEqual(RoleClosure.objects.filter(descendant=cashier).count(), 4)
+
+        invoice = Invoice.objects.prefetch_related('items').first()
+        self.assertEqual(invoice.total_amount, sum(item.amount for item in invoice.items.all()))
+        self.assertEqual(sum(DailySalesSummary.objects.values_list('invoice_count', flat=True)), 50)
+
+        response = APIClient().post('/api/login/', {'email': 'cashier1.0@seed.local', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class JSONRendererTests(SalesAPITestCase):
+    payload = {
+        'id': 7, 'total_amount': '12.50', 'raw_amount': Decimal('12.5'), 'paid': True, 'note': None,
+        'invoice_date': date(2024, 2, 29), 'uuid': uuid.UUID(int=1),
+        'created_at': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+        'name': 'Café \u2028 line\u2029 "quoted"', 'counts': {1: 2}, 'items': [{'quantity': 3}],
+    }
+
+    def test_matches_drf_renderer_bytes(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+        indented = 'application/json; indent=2'
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, indented), JSONRenderer().render(self.payload, indented)
+        )
+
+    def test_api_response_matches_drf_renderer(self):
+        self.create_invoice(self.employee, lines=3)
+        response = self.client_for(self.manager).get('/api/invoices/')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_parser(self):
+        body = JSONRenderer().render(self.payload)
+        parsed = FastJSONParser().parse(BytesIO(body))
+        self.assertEqual(parsed['name'], self.payload['name'])
+        self.assertEqual(parsed['created_at'], '2024-01-02T03:04:05.678901Z')
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"id": NaN}'))
+
+    @skipUnless(orjson is None, "only without orjson")
+    def test_fallback_without_orjson(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+
+@skipUnless(connection.vendor == 'postgresql', "needs real row-level locking (SALES_DB_ENGINE=postgres)")
+class StockLockingTests(TransactionTestCase):
+    """Concurrent create_invoice calls racing for the same stock."""
+    writers = 8
+
+    def setUp(self):
+        role = Role.objects.create(name='Cashier')
+        self.user = User.objects.create_user(
+            username='cashier', email='cashier@test.com', password='secret123', name='cashier', role=role
+        )
+        self.customer = Customer.objects.create(name='Customer', email='customer@test.com', mobile='0100')
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price='1.00', quantity=5) for i in range(2)
+        ]
+
+    def race(self, items_for):
+        barrier = threading.Barrier(self.writers)
+        outcomes = []
+
+        def writer(index):
+            try:
+                barrier.wait()
+                create_invoice(self.customer, items_for(index), self.user)
+                outcomes.append('created')
+            except ValueError:
+                outcomes.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_stock_is_never_oversold(self):
+        outcomes = self.race(lambda index: [{'product_id': self.products[0].id, 'quantity': 1}])
+        self.assertEqual(outcomes.count('created'), 5)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity, 0)
+        self.assertEqual(Invoice.objects.count(), 5)
+
+    def test_opposite_lock_order_does_not_deadlock(self):
+        first, second = self.products
+        def items_for(index):
+            ordered = [first, second] if index % 2 else [second, first]
+            return [{'product_id': product.id, 'quantity': 1} for product in ordered]
+
+        outcomes = self.race(items_for)
+        self.assertEqual(outcomes.count('created'), 5)
+        for product in self.products:
+            self.assertEqual(Product.objects.get(pk=product.pk).quantity, 0)
+
+    def test_sharded_stock_is_never_oversold(self):
+        product = self.products[0]
+        compact_product_stock(product.pk, shards=3)
+        outcomes = self.race(lambda index: [{'product_id': product.id, 'quantity': 1}])
+        self.assertEqual(outcomes.count('created'), 5)
+        self.assertEqual(live_stock([product.pk])[product.pk], 0)
+
+
+class AdminTests(SalesAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.superuser = User.objects.create_superuser(
+            username='root', email='root@test.com', password='secret123', name='root'
+        )
+        self.client.force_login(self.superuser)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def test_changelists_use_constant_queries(self):
+        for url in ['/admin/sales_app/invoice/', '/admin/sales_app/invoiceproduct/', '/admin/sales_app/user/']:
+            self.create_invoice(self.employee)
+            _, baseline = self.get(url)
+            for index in range(3):
+                customer = Customer.objects.create(name=f'{url} {index}', email=f'{index}{url}@test.com', mobile=f'{url}{index}')
+                Invoice.objects.create(customer=customer, created_by=self.manager, total_amount=0)
+                self.create_invoice(self.employee)
+                self.create_user(f'{url}{index}', Role.objects.create(name=f'{url} {index}'))
+            self.assertEqual(self.get(url)[1], baseline, url)
+
+    def test_count_stops_at_the_exact_count_limit(self):
+        for _ in range(4):
+            self.create_invoice(self.employee, lines=0)
+        with patch.object(EstimatedCountPaginator, 'exact_count_limit', 2):
+            self.assertEqual(EstimatedCountPaginator(Invoice.objects.order_by('id'), 2).count, 4)
+        self.assertEqual(EstimatedCountPaginator(Invoice.objects.filter(status='paid').order_by('id'), 2).count, 0)
+
+    def test_invoice_page_renders_only_its_own_lines(self):
+        invoice = self.create_invoice(self.employee, lines=2)
+        response, _ = self.get(f'/admin/sales_app/invoice/{invoice.id}/change/')
+        self.assertContains(response, 'Product 1')
+        self.assertNotContains(response, 'Product 4')  # autocomplete: no <select> of every product
+        self.assertContains(response, 'items-TOTAL_FORMS')
+
+        with patch.object(InvoiceProductInline, 'max_lines', 1):
+            response, _ = self.get(f'/admin/sales_app/invoice/{invoice.id}/change/')
+        self.assertNotContains(response, 'items-TOTAL_FORMS')
+        self.assertContains(response, f'/admin/sales_app/invoiceproduct/?invoice__id__exact={invoice.id}')
+
+    def test_date_hierarchy_matches_distinct_dates(self):
+        for day in (date(2023, 12, 31), date(2024, 1, 1), date(2024, 1, 3), date(2024, 3, 1)):
+            invoice = self.create_invoice(self.employee, lines=0)
+            Invoice.objects.filter(pk=invoice.pk).update(created_at=datetime(day.year, day.month, day.day, 23, tzinfo=timezone.utc))
+        queryset = Invoice.objects.filter(created_at__year__lte=2024)
+        fast = DateHierarchyQuerySet(Invoice, queryset.query)
+        for kind in ('year', 'month', 'day'):
+            self.assertEqual(list(fast.datetimes('created_at', kind)), list(queryset.datetimes('created_at', kind)), kind)
+        self.assertEqual(
+            list(fast.datetimes('created_at', 'month', order='DESC')),
+            list(queryset.datetimes('created_at', 'month', order='DESC'))
+        )
+
+
+class CachedJWTAuthenticationTests(SalesAPITestCase):
+    def authenticate(self, user):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_cached_user_and_role_need_no_queries(self):
+        self.authenticate(self.employee)
+        with self.assertNumQueries(0):
+            user = self.authenticate(self.employee)
+            self.assertEqual(user.role.name, 'Sales Employee 1')
+        self.assertIsNot(user, self.authenticate(self.employee))
+
+    def test_user_and_role_saves_invalidate(self):
+        self.authenticate(self.employee)
+        self.employee_role.name = 'Sales Employee A'
+        self.employee_role.save()
+        self.assertEqual(self.authenticate(self.employee).role.name, 'Sales Employee A')
+
+        self.employee.role = self.manager_role
+        self.employee.save()
+        self.assertEqual(self.authenticate(self.employee).role_id, self.manager_role.id)
+
+    def test_deactivated_user_is_rejected(self):
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.employee).access_token}'}
+        self.assertEqual(self.client.get('/api/products/', headers=headers).status_code, 200)
+        self.employee.status = False
+        self.employee.save()
+        response = self.client.get('/api/products/', headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_inactive')
+
+
+class ValidatorTests(SalesAPITestCase):
+    def test_unique_fields_are_checked_in_one_query(self):
+        validator = CustomerValidator({'name': 'Other', 'email': 'CUSTOMER@test.com', 'mobile': '0100'})
+        with self.assertNumQueries(1):
+            self.assertFalse(validator.is_valid())
+        self.assertEqual(validator.errors, {
+            'email': ['This email already exists.'], 'mobile': ['This mobile already exists.'],
+        })
+        with self.assertNumQueries(1):
+            self.assertTrue(CustomerValidator(
+                {'name': 'Customer', 'email': 'customer@test.com', 'mobile': '0100'}
+            ).is_valid(exclude_id=self.customer.id))
+
+    def test_invoice_lookups_are_batched(self):
+        items = [{'product_id': product.id, 'quantity': 1} for product in self.products]
+        validator = InvoiceValidator({'customer_id': self.customer.id, 'items': items})
+        with self.assertNumQueries(2):
+            self.assertTrue(validator.is_valid())
+        self.assertEqual(set(validator.products), {product.id for product in self.products})
+
+    def test_non_numeric_ids_are_errors_not_lookups(self):
+        items = [
+            {'product_id': 'abc', 'quantity': 1},
+            {'product_id': self.products[0].id, 'quantity': 'two'},
+            {'product_id': self.products[1].id, 'quantity': 5000},
+        ]
+        validator = InvoiceValidator({'customer_id': 'xyz', 'items': items})
+        with self.assertNumQueries(1):  # products only; no customer id to look up
+            self.assertFalse(validator.is_valid())
+        self.assertEqual(validator.errors, {
+            'customer_id': ['Customer not found.'],
+            'item_0': ['Product not found.'],
+            'item_1': ['Quantity must be a number.'],
+            'item_2': [f'Not enough quantity for {self.products[1].name}. Available: 1000'],
+        })
+
+        validator = UserValidator({'name': 'Someone', 'email': 'someone@test.com', 'password': 'secret123', 'role': 'manager'})
+        with self.assertNumQueries(1):
+            self.assertFalse(validator.is_valid())
+        self.assertEqual(validator.errors, {'role': ['Role does not exist.']})
+
+
+class KeysetPaginationTests(SalesAPITestCase):
+    def cursor(self, value, pk):
+        return base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+
+    def test_cursor_continues_across_pages(self):
+        invoices = [self.create_invoice(self.employee, lines=1) for _ in range(5)]
+        # a created_at tie (ordered by id) and an undated row (served last)
+        tied = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        Invoice.objects.filter(pk__in=[invoices[1].pk, invoices[2].pk]).update(created_at=tied)
+        Invoice.objects.filter(pk=invoices[0].pk).update(created_at=None)
+
+        client, url, ids = self.client_for(self.manager), '/api/invoices/?limit=2', []
+        while url:
+            body = client.get(url).json()
+            self.assertLessEqual(len(body['results']), 2)
+            ids += [row['id'] for row in body['results']]
+            url = body['next']
+        expected = [invoices[4].id, invoices[3].id, invoices[2].id, invoices[1].id, invoices[0].id]
+        self.assertEqual(ids, expected)
+
+    def test_invalid_or_tampered_cursors_are_rejected(self):
+        client = self.client_for(self.manager)
+        for cursor in [
+            'not base64!', base64.urlsafe_b64encode(b'garbage').decode(), self.cursor('yesterday', 1),
+            self.cursor('2024-01-01T00:00:00+00:00', 'x'), self.cursor('2024-13-45T00:00:00', 1), self.cursor([], 1),
+        ]:
+            response = client.get('/api/invoices/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+            self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+        self.assertEqual(client.get('/api/invoices/', {'cursor': self.cursor(None, 1)}).status_code, 200)
+
+
+class ExportTests(SalesAPITestCase):
+    def export(self, user, url):
+        response = self.client_for(user).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_one_row_per_invoice_line(self):
+        invoice = self.create_invoice(self.employee, lines=2)
+        body = self.export(self.employee, '/api/invoices/export/?type=csv')
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['invoice_id', 'invoice_date', 'status'])
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(
+            sorted(line.split(',')[10] for line in lines[1:]), [self.products[0].name, self.products[1].name]
+        )
+        self.assertTrue(all(line.startswith(f'{invoice.id},') for line in lines[1:]))
+
+    def test_ndjson_streams_one_object_per_row(self):
+        body = self.export(self.admin, '/api/products/export/?type=ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['name'] for row in rows], [product.name for product in self.products])
+        self.assertEqual(rows[0]['price'], '2.50')
+
+    def test_exports_are_role_scoped(self):
+        peer = self.create_user('peer', self.employee_role)
+        own = self.create_invoice(self.employee, lines=1)
+        other = self.create_invoice(peer, lines=1)
+
+        def invoice_ids(user):
+            body = self.export(user, '/api/invoices/export/?type=ndjson')
+            return sorted(json.loads(line)['invoice_id'] for line in body.splitlines())
+
+        self.assertEqual(invoice_ids(self.employee), [own.id])
+        self.assertEqual(invoice_ids(self.manager), [own.id, other.id])
+        self.assertEqual(self.client_for(self.employee).get('/api/invoices/export/?type=xml').status_code, 400)
+
+
+class InvoiceBulkTests(SalesAPITestCase):
+    def invoice(self, quantity=1, customer_id=None):
+        return {'customer_id': customer_id or self.customer.id, 'items': [{'product_id': self.products[0].id, 'quantity': quantity}]}
+
+    def bulk(self, invoices, mode='atomic'):
+        return self.client_for(self.employee).post('/api/invoices/bulk/', {'mode': mode, 'invoices': invoices}, format='json')
+
+    def savepoints(self, invoices):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk(invoices, 'partial')
+        self.assertEqual(response.status_code, 201, response.content)
+        return sum(1 for query in queries if query['sql'].startswith('SAVEPOINT'))
+
+    def test_atomic_mode_rolls_back_every_invoice(self):
+        # each fits the stock on its own, not together
+        response = self.bulk([self.invoice(600), self.invoice(600)])
+        self.assertEqual(response.status_code, 400, response.content)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['rolled_back', 'failed'])
+        self.assertIn('Insufficient stock', results[1]['errors']['error'][0])
+        self.assertEqual(Invoice.objects.count(), 0)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity, 1000)
+
+        response = self.bulk([self.invoice(2), self.invoice(3)])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).quantity, 995)
+
+    def test_partial_mode_reports_each_invoice(self):
+        response = self.bulk([self.invoice(600), self.invoice(600), self.invoice(1)], 'partial')
+        self.assertEqual(response.status_code, 207, response.content)
+        body = response.json()
+        self.assertEqual(body['created'], 2)
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'failed', 'created'])
+        self.assertEqual(body['results'][0]['total_amount'], '1500.00')
+        self.assertEqual(
+            sorted(Invoice.objects.values_list('id', flat=True)), [body['results'][0]['id'], body['results'][2]['id']]
+        )
+
+    def test_validation_errors_are_reported_per_invoice(self):
+        invoices = [self.invoice(1), self.invoice(1, customer_id=999999), {'customer_id': self.customer.id, 'items': []}, 'nope']
+        response = self.bulk(invoices)
+        self.assertEqual(response.status_code, 400, response.content)
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['valid', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(results[1]['errors'], {'customer_id': ['Customer not found.']})
+        self.assertEqual(results[2]['errors'], {'items': ['Invoice must have at least one product.']})
+        self.assertEqual(results[3]['errors'], {'invoice': ['Invalid invoice format.']})
+        self.assertEqual(Invoice.objects.count(), 0)
+
+        response = self.bulk(invoices, 'partial')
+        self.assertEqual(response.status_code, 207, response.content)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['created', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_null_and_non_numeric_quantities_are_per_invoice_errors(self):
+        invoices = [self.invoice(None), self.invoice('two'), self.invoice([1]), self.invoice(1)]
+        for mode, expected_status in (('atomic', 400), ('partial', 207)):
+            response = self.bulk(invoices, mode)
+            self.assertEqual(response.status_code, expected_status, response.content)
+            results = response.json()['results']
+            self.assertEqual([result.get('errors') for result in results[:3]], [{'item_0': ['Quantity must be a number.']}] * 3)
+        self.assertEqual(results[3]['status'], 'created')
+
+    @override_settings(SALES_INVOICE_BULK_MAX=3)
+    def test_batch_size_limit(self):
+        response = self.bulk([self.invoice()] * 4)
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(response.json(), {'invoices': ['At most 3 invoices per request.']})
+        self.assertEqual(self.bulk([]).status_code, 400)
+        self.assertEqual(self.bulk([self.invoice()] * 3).status_code, 201)
+
+    def test_partial_mode_commits_in_chunks(self):
+        with override_settings(SALES_INVOICE_BULK_CHUNK_SIZE=100):
+            one_chunk = self.savepoints([self.invoice()] * 5)
+        with override_settings(SALES_INVOICE_BULK_CHUNK_SIZE=2):
+            three_chunks = self.savepoints([self.invoice()] * 5)
+        self.assertEqual(three_chunks - one_chunk, 2)
+        self.assertEqual(Invoice.objects.count(), 10)
+
+
+class RoleTests(SalesAPITestCase):
+    def test_repeated_model_names_are_rejected(self):
+        client = self.client_for(self.manager)
+        permissions = [{'model_name': 'invoice', 'read': True}, {'model_name': 'Invoice', 'create': True}]
+        response = client.post('/api/roles/', {'name': 'Sales Employee 2', 'permissions': permissions}, format='json')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn('invoice', str(response.json()['permissions']))
+        self.assertFalse(Role.objects.filter(name='Sales Employee 2').exists())
+
+        response = self.client_for(self.admin).put(
+            f'/api/roles/{self.employee_role.id}/', {'name': 'Sales Employee 1', 'permissions': permissions}, format='json'
+        )
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(Permission.objects.filter(role=self.employee_role).count(), 7)
+
+    def closure(self, role):
+        return dict(RoleClosure.objects.filter(descendant=role).values_list('ancestor_id', 'depth'))
+
+    def test_closure_follows_create_reparent_and_delete(self):
+        cashier_role = Role.objects.create(name='Cashier 1', parent_role=self.employee_role)
+        self.assertEqual(self.closure(cashier_role), {
+            cashier_role.id: 0, self.employee_role.id: 1, self.manager_role.id: 2, self.admin_role.id: 3,
+        })
+
+        self.employee_role.parent_role = self.admin_role
+        self.employee_role.save()
+        self.assertEqual(self.closure(cashier_role), {cashier_role.id: 0, self.employee_role.id: 1, self.admin_role.id: 2})
+        self.assertEqual(RoleClosure.objects.descendant_ids(self.manager_role), [])
+
+        self.employee_role.delete()
+        cashier_role.refresh_from_db()
+        self.assertIsNone(cashier_role.parent_role_id)
+        self.assertEqual(self.closure(cashier_role), {cashier_role.id: 0})
+
+    def test_cycles_are_rejected(self):
+        self.admin_role.parent_role = self.employee_role
+        with self.assertRaises(ValidationError) as raised:
+            self.admin_role.clean()
+        self.assertIn('parent_role', raised.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            self.admin_role.save()
+
+        self.manager_role.parent_role = self.manager_role
+        serializer = RoleSerializer(self.manager_role, data={'name': 'Sales Manager 1'}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('parent_role', serializer.errors)
+        self.assertEqual(self.closure(self.admin_role), {self.admin_role.id: 0})
+
+    def test_rebuild_role_closure_invalidates_compiled_hierarchy(self):
+        self.assertIn(self.employee_role.id, permission_matrix.child_role_ids(self.manager_role.id))
+        version = role_version(self.employee_role.id)
+
+        # a raw re-parent skips the signals that maintain the closure
+        Role.objects.filter(pk=self.employee_role.pk).update(parent_role=self.admin_role)
+        call_command('rebuild_role_closure', stdout=StringIO())
+        self.assertNotIn(self.employee_role.id, permission_matrix.child_role_ids(self.manager_role.id))
+        self.assertIn(self.employee_role.id, permission_matrix.child_role_ids(self.admin_role.id))
+        self.assertNotEqual(role_version(self.employee_role.id), version)
+
+
+class ReportTests(SalesAPITestCase):
+    def sell(self, user, quantity=1):
+        return create_invoice(self.customer, [{'product_id': self.products[0].id, 'quantity': quantity}], user)
+
+    def report(self, user, group_by='status'):
+        response = self.client_for(user).get(f'/api/reports/?group_by={group_by}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def test_reports_are_scoped_like_the_invoice_list(self):
+        peer = self.create_user('peer', self.employee_role)
+        self.sell(peer, 2)
+        self.assertEqual(self.client_for(self.employee).get('/api/invoices/').json()['results'], [])
+        self.assertEqual(self.report(self.employee), [])
+
+        self.sell(self.employee, 1)
+        self.assertEqual(self.report(self.employee), [{'status': 'pending', 'invoice_count': 1, 'total_amount': '2.50'}])
+        self.assertEqual(self.report(self.manager), [{'status': 'pending', 'invoice_count': 2, 'total_amount': '7.50'}])
+        self.assertEqual(self.report(peer, 'product')[0]['quantity'], 2)
+
+    def test_summaries_follow_a_role_change(self):
+        invoice = self.sell(self.employee, 2)
+        self.employee.role = self.manager_role
+        self.employee.save()
+        response = self.client_for(self.admin).patch(f'/api/invoices/{invoice.id}/', {'status': 'paid'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        # no bucket left behind under the old role, none gone negative
+        expected = {(self.manager_role.id, 'paid', 1)}
+        for model in (DailySalesSummary, DailyCustomerSales):
+            rows = model.objects.exclude(invoice_count=0)
+            self.assertEqual({(row.role_id, row.status, row.invoice_count) for row in rows}, expected)
+        rows = DailyProductSales.objects.exclude(quantity=0)
+        self.assertEqual({(row.role_id, row.status, row.quantity) for row in rows}, {(self.manager_role.id, 'paid', 2)})
+        counts = {row['status']: row['invoice_count'] for row in self.report(self.employee)}
+        self.assertEqual(counts, {'paid': 1, 'pending': 0})
+        self.assertEqual(self.report(self.manager), [])
+
+
+@override_settings(SALES_JWT_PERMISSION_CLAIMS=True)
+class PermissionClaimsTests(SalesAPITestCase):
+    def patch_invoice(self, access, invoice):
+        return APIClient().patch(
+            f'/api/invoices/{invoice.id}/', {'customer': self.customer.id}, format='json',
+            headers={'Authorization': f'Bearer {access}'}
+        )
+
+    def granting_update(self, user):
+        """An access token whose signed claims grant update on invoices, which the database does not."""
+        access = PermissionClaimsRefreshToken.for_user(user).access_token
+        access['perms'] = {**access['perms'], 'invoice': access['perms']['invoice'] | PERMISSION_BITS['update']}
+        return str(access)
+
+    def test_claims_are_signed_into_access_tokens_only(self):
+        response = APIClient().post('/api/login/', {'email': self.employee.email, 'password': 'secret123'})
+        tokens = response.json()
+        self.assertNotIn('perms', RefreshToken(tokens['refresh']).payload)
+        access = AccessToken(tokens['access'])
+        self.assertEqual((access['role_id'], access['perms']['invoice']), (self.employee_role.id, 3))
+
+        # a refresh signs the permissions as they are now
+        Permission.objects.filter(role=self.employee_role, model_name='invoice').update(update=True)
+        permission_matrix.invalidate()
+        response = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(AccessToken(response.json()['access'])['perms']['invoice'], 7)
+
+    def test_authorization_follows_the_claims(self):
+        invoice = self.create_invoice(self.employee)
+        self.assertEqual(self.patch_invoice(self.granting_update(self.employee), invoice).status_code, 200)
+
+    def test_role_version_bump_revokes_the_claims(self):
+        invoice = self.create_invoice(self.employee)
+        access = self.granting_update(self.employee)
+        invalidate_roles([self.employee_role.id])
+        self.assertEqual(self.patch_invoice(access, invoice).status_code, 403)
+
+    def test_role_reassignment_revokes_the_claims(self):
+        invoice = self.create_invoice(self.employee)
+        access = self.granting_update(self.employee)
+        clerk_role = Role.objects.create(name='Clerk', parent_role=self.manager_role)
+        Permission.objects.create(role=clerk_role, model_name='invoice', read=True)
+        self.employee.role = clerk_role
+        self.employee.save()
+        self.assertEqual(self.patch_invoice(access, invoice).status_code, 403)
+
+
+class AsyncReadTests(SalesAPITestCase):
+    """The async read routes return what the viewset routes return."""
+
+    def auth_headers(self, user):
+        return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    async def assert_same_response(self, user, sync_url, async_url):
+        headers = await sync_to_async(self.auth_headers)(user)
+        expected = await sync_to_async(self.client.get)(sync_url, headers=headers)
+        response = await self.async_client.get(async_url, headers=headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        body, expected_body = response.json(), expected.json()
+        if 'next' in body and body['next']:
+            # same cursor, on the async route
+            self.assertEqual(body.pop('next').replace('/api/async/', '/api/'), expected_body.pop('next'))
+        self.assertEqual(body, expected_body)
+        return response
+
+    async def test_lists_match_sync_routes(self):
+        await sync_to_async(self.create_invoice)(self.employee, lines=3)
+        for name in ('products', 'customers', 'invoices'):
+            await self.assert_same_response(self.manager, f'/api/{name}/?limit=2', f'/api/async/{name}/?limit=2')
+
+    async def test_retrieve_is_scoped(self):
+        invoice = await sync_to_async(self.create_invoice)(self.manager, lines=2)
+        response = await self.assert_same_response(
+            self.manager, f'/api/invoices/{invoice.id}/', f'/api/async/invoices/{invoice.id}/'
+        )
+        self.assertEqual(len(response.json()['items']), 2)
+        # the employee's role is below the manager's, so the invoice is out of scope
+        response = await self.assert_same_response(
+            self.employee, f'/api/invoices/{invoice.id}/', f'/api/async/invoices/{invoice.id}/'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/async/invoices/')
+        self.assertEqual(response.status_code, 401)
@@ -6,11 +6,11 @@ from .views import (
     InvoiceViewSet, 
     CustomerViewSet, 
     RoleViewSet,
-    MyTokenObtainPairView 
-)
-from rest_framework_simplejwt.views import (
-    TokenRefreshView
+    ReportViewSet,
+    MyTokenObtainPairView,
+    MyTokenRefreshView
 )
+from .async_views import AsyncProductView, AsyncCustomerView, AsyncInvoiceView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -18,11 +18,20 @@ router.register(r'roles', RoleViewSet, basename='role')
 router.register(r'customers', CustomerViewSet, basename='customer')
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'invoices', InvoiceViewSet, basename='invoice')
+router.register(r'reports', ReportViewSet, basename='report')
 
 urlpatterns = [
     path('', include(router.urls)),
 
     # Authentication Routes (JWT)
     path('login/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', MyTokenRefreshView.as_view(), name='token_refresh'),
+
+    # Async read-only routes (served without a thread per request under ASGI)
+    path('async/products/', AsyncProductView.as_view(), name='async-product-list'),
+    path('async/products/<int:pk>/', AsyncProductView.as_view(), name='async-product-detail'),
+    path('async/customers/', AsyncCustomerView.as_view(), name='async-customer-list'),
+    path('async/customers/<int:pk>/', AsyncCustomerView.as_view(), name='async-customer-detail'),
+    path('async/invoices/', AsyncInvoiceView.as_view(), name='async-invoice-list'),
+    path('async/invoices/<int:pk>/', AsyncInvoiceView.as_view(), name='async-invoice-detail'),
 ]
\ No newline at end of file
@@ -1,20 +1,75 @@
 import re
+from django.db.models import Q
 from .models import User, Role, Customer, Product, Invoice
+from .stock import live_quantity
+
+EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+
+
+def as_id(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
 
 class BaseValidator:
     """
     Validation Layer: (data types - min&max length - unique - required - data format)
+
+    Subclasses declare their rules as class attributes; they are compiled once
+    per class into `rules` and run by validate(), then clean() runs the checks
+    that depend on the data. Unique checks for one model are batched into a
+    single query, and objects fetched while validating stay on the validator
+    (see add_lookup) so the view does not fetch them again.
     """
+    required_fields = ()
+    email_fields = ()
+    unique_model = None
+    unique_fields = ()
+    case_insensitive_fields = ()
+    length_rules = {}       # field: (min_len, max_len)
+    positive_fields = ()
+
+    rules = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.rules = cls.compile_rules()
+
+    @classmethod
+    def compile_rules(cls):
+        rules = []
+        if cls.required_fields:
+            rules.append((cls.check_required, (tuple(cls.required_fields),)))
+        for field in cls.email_fields:
+            rules.append((cls.check_email_format, (field,)))
+        if cls.unique_model is not None and cls.unique_fields:
+            rules.append((cls.check_unique_fields, (cls.unique_model, tuple(cls.unique_fields))))
+        for field, (min_len, max_len) in cls.length_rules.items():
+            rules.append((cls.check_length, (field, min_len, max_len)))
+        for field in cls.positive_fields:
+            rules.append((cls.check_positive_number, (field,)))
+        return tuple(rules)
+
     def __init__(self, data):
         self.data = data
         self.errors = {}
-        self.exclude_id = None  
+        self.exclude_id = None
+        self.lookups = {}
 
     def add_error(self, field, message):
         if field not in self.errors:
             self.errors[field] = []
         self.errors[field].append(message)
 
+    def add_lookup(self, name, model, ids):
+        """Fetch every referenced row of `model` (or queryset) in one IN query: self.lookups[name] = {id: obj}."""
+        ids = {as_id(value) for value in ids} - {None}
+        rows = model._default_manager.all() if isinstance(model, type) else model
+        self.lookups[name] = rows.in_bulk(ids) if ids else {}
+        return self.lookups[name]
+
     def check_required(self, fields):
         for field in fields:
             value = self.data.get(field)
@@ -32,8 +87,7 @@ class BaseValidator:
     def check_email_format(self, field):
         email = self.data.get(field)
         if email:
-            regex = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-            if not re.match(regex, email):
+            if not EMAIL_REGEX.match(email):
                 self.add_error(field, "Invalid email format.")
 
     def check_positive_number(self, field):
@@ -46,65 +100,130 @@ class BaseValidator:
             except (ValueError, TypeError):
                 self.add_error(field, "Must be a valid number.")
 
-    def check_unique(self, model, field, exclude_id=None):
-        value = self.data.get(field)
-        if value:
-            query = {field: value}
-            qs = model.objects.filter(**query)
-            
-            actual_exclude_id = exclude_id or self.exclude_id
-            if actual_exclude_id:
-                qs = qs.exclude(id=actual_exclude_id)
-            
-            if qs.exists():
+    def check_unique_fields(self, model, fields, exclude_id=None):
+        """
+        One query for all unique fields: WHERE f1 = v1 OR LOWER(f2) = v2 ...
+        (fields in case_insensitive_fields match their Lower() unique index).
+        """
+        values = {field: self.data.get(field) for field in fields if self.data.get(field)}
+        if not values:
+            return
+
+        def normalize(field, value):
+            value = str(value)
+            return value.lower() if field in self.case_insensitive_fields else value
+
+        match = Q()
+        for field, value in values.items():
+            lookup = f'{field}__lower' if field in self.case_insensitive_fields else field
+            match |= Q(**{lookup: normalize(field, value)})
+        qs = model.objects.filter(match)
+
+        actual_exclude_id = exclude_id or self.exclude_id
+        if actual_exclude_id:
+            qs = qs.exclude(id=actual_exclude_id)
+
+        taken = set()
+        for row in qs.values_list(*values):
+            taken.update(
+                field for field, value in zip(values, row)
+                if value is not None and normalize(field, value) == normalize(field, values[field])
+            )
+        for field in values:
+            if field in taken:
                 self.add_error(field, f"This {field} already exists.")
 
+    def check_unique(self, model, field, exclude_id=None):
+        self.check_unique_fields(model, (field,), exclude_id)
+
     def is_valid(self, exclude_id=None):
         self.exclude_id = exclude_id
-        self.validate() 
+        self.validate()
         return len(self.errors) == 0
+
     def validate(self):
-        raise NotImplementedError("Subclasses must implement validate method.")
+        for rule, args in self.rules:
+            rule(self, *args)
+        self.clean()
+
+    def clean(self):
+        """Data-dependent checks that cannot be declared as class rules."""
 
 class UserValidator(BaseValidator):
+    email_fields = ('email',)
+    unique_model = User
+    unique_fields = ('email',)
+    length_rules = {'name': (3, 50)}
+
     def validate(self):
+        self.role_key = 'role' if 'role' in self.data else 'role_id'
+        self.check_required(['name', 'email', 'password', self.role_key])
+        super().validate()
 
-        role_key = 'role' if 'role' in self.data else 'role_id'
-        self.check_required(['name', 'email', 'password', role_key])
-        self.check_email_format('email')
-        self.check_unique(User, 'email')
-        self.check_length('name', min_len=3, max_len=50)
-        
+    def clean(self):
+        role_key = self.role_key
         if not self.exclude_id or self.data.get('password'):
              self.check_length('password', min_len=6)
-        
+
         role_val = self.data.get(role_key)
-        if role_val and not Role.objects.filter(id=role_val).exists():
-            self.add_error(role_key, "Role does not exist.")
+        if role_val:
+            roles = self.add_lookup('roles', Role, [role_val])
+            if as_id(role_val) not in roles:
+                self.add_error(role_key, "Role does not exist.")
 
 
 class ProductValidator(BaseValidator):
-    def validate(self):
-        self.check_required(['name', 'price', 'quantity'])
-        self.check_unique(Product, 'name')
-        self.check_positive_number('price')
-        self.check_positive_number('quantity')
+    required_fields = ('name', 'price', 'quantity')
+    unique_model = Product
+    unique_fields = ('name',)
+    positive_fields = ('price', 'quantity')
 
 
 class CustomerValidator(BaseValidator):
-    def validate(self):
-        self.check_required(['name', 'email', 'mobile'])
-        self.check_email_format('email')
-        self.check_unique(Customer, 'email')
-        self.check_unique(Customer, 'mobile')
+    required_fields = ('name', 'email', 'mobile')
+    email_fields = ('email',)
+    unique_model = Customer
+    unique_fields = ('email', 'mobile')
+    case_insensitive_fields = ('email',)
 
 
 class InvoiceValidator(BaseValidator):
-    def validate(self):
-        self.check_required(['customer_id', 'items'])
-        
+    required_fields = ('customer_id', 'items')
+
+    def __init__(self, data, products=None, customers=None):
+        super().__init__(data)
+        # Optional shared {id: obj} lookups, so a batch of invoices is
+        # validated against one Product / Customer fetch.
+        if products is not None:
+            self.lookups['products'] = products
+        if customers is not None:
+            self.lookups['customers'] = customers
+
+    @property
+    def products(self):
+        return self.lookups.get('products', {})
+
+    @property
+    def customers(self):
+        return self.lookups.get('customers', {})
+
+    def clean(self):
+        customer_id = self.data.get('customer_id')
         items = self.data.get('items')
-        if items is not None and isinstance(items, list):
+        if not isinstance(items, list):
+            items = None
+
+        if 'customers' not in self.lookups:
+            self.add_lookup('customers', Customer, [customer_id])
+        if 'products' not in self.lookups:
+            self.add_lookup('products', Product.objects.annotate(live_quantity=live_quantity()), [
+                item.get('product_id') for item in items or [] if isinstance(item, dict)
+            ])
+
+        if customer_id and as_id(customer_id) not in self.customers:
+            self.add_error('customer_id', "Customer not found.")
+
+        if items is not None:
             if len(items) == 0:
                 self.add_error('items', "Invoice must have at least one product.")
 
@@ -115,15 +234,16 @@ class InvoiceValidator(BaseValidator):
                 if 'product_id' not in item or 'quantity' not in item:
                     self.add_error(f'item_{index}', "Product ID and Quantity are required.")
                 else:
-                    prod = Product.objects.filter(id=item['product_id']).first()
+                    prod = self.products.get(as_id(item['product_id']))
                     if not prod:
                         self.add_error(f'item_{index}', "Product not found.")
                     else:
                         try:
                             qty = int(item['quantity'])
+                            available = getattr(prod, 'live_quantity', prod.quantity)
                             if qty <= 0:
                                 self.add_error(f'item_{index}', "Quantity must be positive.")
-                            elif prod.quantity < qty:
-                                self.add_error(f'item_{index}', f"Not enough quantity for {prod.name}. Available: {prod.quantity}")
-                        except ValueError:
-                             self.add_error(f'item_{index}', "Quantity must be a number.")
\ No newline at end of file
+                            elif available < qty:
+                                self.add_error(f'item_{index}', f"Not enough quantity for {prod.name}. Available: {available}")
+                        except (TypeError, ValueError):
+                             self.add_error(f'item_{index}', "Quantity must be a number.")
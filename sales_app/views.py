@@ -1,11 +1,14 @@
 from django.shortcuts import render
+from django.conf import settings
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db import transaction
 from django.db.models import Q
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import User, Role, Customer, Product, Invoice, InvoiceProduct, Permission
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .models import User, Role, Customer, Product, Invoice, Permission
 from .serializers import (
     UserSerializer, RoleSerializer, CustomerSerializer, 
     ProductSerializer, InvoiceSerializer
@@ -13,9 +16,19 @@ from .serializers import (
 from .validators import (
     UserValidator, ProductValidator, InvoiceValidator, CustomerValidator
 )
-from .permissions import DynamicHierarchicalPermission, get_all_child_roles
+from .services import create_invoice, load_invoice_lookups
+from .optimization import optimize_queryset
+from .exports import ExportMixin
+from .catalog import CatalogCacheMixin
+from .search import SearchMixin
+from .stock import live_quantity
+from .reporting import invoice_snapshot, invoice_lines, record_invoice, sales_report, REPORT_GROUPINGS
+from .authentication import PermissionClaimsRefreshToken
+from .permissions import DynamicHierarchicalPermission, get_auth_context
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = PermissionClaimsRefreshToken
+
     def validate(self, attrs):
         data = super().validate(attrs)
         user = self.user
@@ -42,31 +55,54 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = PermissionClaimsRefreshToken
+
+class MyTokenRefreshView(TokenRefreshView):
+    serializer_class = MyTokenRefreshSerializer
+
 class BaseSalesViewSet(viewsets.ModelViewSet):
     permission_classes = [DynamicHierarchicalPermission]
 
+    # select_related / prefetch_related / only() are derived from the fields
+    # the action's serializer reads. only() is kept to read actions, since
+    # deferred instances would be saved back with just their loaded fields.
+    optimize_queries = True
+    defer_fields_actions = ('list', 'retrieve')
+
     def get_queryset(self):
+        queryset = self.scope_queryset(super().get_queryset())
+        if self.optimize_queries:
+            queryset = optimize_queryset(
+                queryset,
+                self.get_serializer(),
+                defer_fields=self.action in self.defer_fields_actions,
+                always_load=[getattr(self.paginator, 'ordering_field', 'pk')]
+            )
+        return queryset
+
+    def scope_queryset(self, queryset):
         user = self.request.user
-        queryset = super().get_queryset()
         
         if not user or not user.is_authenticated:
             return queryset.none()
+
+        context = get_auth_context(self.request)
       
-        if user.is_superuser or (user.role and user.role.name.lower() == 'admin'):
+        if user.is_superuser or context.is_admin:
             return queryset
         
         model_name = self.queryset.model.__name__
     
-        if model_name in ['Product', 'Customer'] and self.action in ['list', 'retrieve']:
+        if model_name in ['Product', 'Customer'] and self.action in ['list', 'retrieve', 'export']:
             return queryset
         
-        child_roles = get_all_child_roles(user.role)
-        child_role_ids = [r.id for r in child_roles]
-        
+        # owner_role is the creator's role, so this stays on the scoped table:
+        # no join to User, no duplicate rows to DISTINCT away
         return queryset.filter(
-            Q(created_by=user) | 
-            Q(created_by__role_id__in=child_role_ids)
-        ).distinct()
+            Q(owner_role_id__in=sorted(context.child_role_ids)) |
+            Q(created_by=user)
+        )
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -101,9 +137,13 @@ class RoleViewSet(BaseSalesViewSet):
             parent_role=self.request.user.role
         )
 
-class CustomerViewSet(BaseSalesViewSet):
+class CustomerViewSet(CatalogCacheMixin, SearchMixin, ExportMixin, BaseSalesViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    export_fields = (
+        ('id', 'id'), ('name', 'name'), ('email', 'email'), ('address', 'address'),
+        ('phone', 'phone'), ('mobile', 'mobile'), ('created_at', 'created_at'),
+    )
     
     def create(self, request, *args, **kwargs):
         validator = CustomerValidator(request.data)
@@ -118,9 +158,16 @@ class CustomerViewSet(BaseSalesViewSet):
             return Response(validator.errors, status=status.HTTP_400_BAD_REQUEST)
         return super().update(request, *args, **kwargs)
 
-class ProductViewSet(BaseSalesViewSet):
+class ProductViewSet(CatalogCacheMixin, SearchMixin, ExportMixin, BaseSalesViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    export_fields = (
+        ('id', 'id'), ('name', 'name'), ('price', 'price'), ('quantity', 'live_quantity'),
+        ('description', 'description'), ('created_at', 'created_at'),
+    )
+
+    def get_export_queryset(self):
+        return super().get_export_queryset().annotate(live_quantity=live_quantity())
 
     def create(self, request, *args, **kwargs):
         validator = ProductValidator(request.data)
@@ -135,9 +182,18 @@ class ProductViewSet(BaseSalesViewSet):
             return Response(validator.errors, status=status.HTTP_400_BAD_REQUEST)
         return super().update(request, *args, **kwargs)
 
-class InvoiceViewSet(BaseSalesViewSet):
+class InvoiceViewSet(ExportMixin, BaseSalesViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
+    # one row per InvoiceProduct, invoice columns repeated
+    export_fields = (
+        ('invoice_id', 'id'), ('invoice_date', 'invoice_date'), ('status', 'status'),
+        ('customer_id', 'customer_id'), ('customer_name', 'customer__name'),
+        ('total_amount', 'total_amount'), ('created_by', 'created_by_id'), ('created_at', 'created_at'),
+        ('item_id', 'items__id'), ('product_id', 'items__product_id'), ('product_name', 'items__product__name'),
+        ('quantity', 'items__quantity'), ('amount', 'items__amount'),
+    )
+    export_ordering = ('id', 'items__id')
 
     def create(self, request, *args, **kwargs):
         validator = InvoiceValidator(request.data)
@@ -146,52 +202,85 @@ class InvoiceViewSet(BaseSalesViewSet):
         
         try:
             with transaction.atomic():
-                customer_obj = Customer.objects.get(id=request.data.get('customer_id'))
-                
-                invoice = Invoice.objects.create(
-                    customer=customer_obj,
-                    created_by=request.user,
-                    status='pending' # Default status is pending
+                customer_obj = validator.customers[int(request.data.get('customer_id'))]
+                invoice = create_invoice(
+                    customer_obj, request.data.get('items', []), request.user, products=validator.products
                 )
                 
-                total_amount = 0
-                items_data = request.data.get('items', [])
-                
-                for item in items_data:
-                    product = Product.objects.select_for_update().get(id=item['product_id'])
-                    qty = int(item['quantity'])
-                    
-                    if product.quantity < qty:
-                        raise ValueError(f"Insufficient stock for product: {product.name}")
-                    
-                    line_amount = product.price * qty
-                    
-                    InvoiceProduct.objects.create(
-                        invoice=invoice,
-                        product=product,
-                        quantity=qty,
-                        amount=line_amount,
-                        created_by=request.user
-                    )
-                    
-                    # Update Stock
-                    product.quantity -= qty
-                    product.save()
-                    total_amount += line_amount
-                
-                # Update Total
-                invoice.total_amount = total_amount
-                invoice.save()
-                
+                serializer = self.get_serializer()
+                invoice = optimize_queryset(Invoice.objects.filter(pk=invoice.pk), serializer).get()
                 serializer = self.get_serializer(invoice)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
                 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        POS batch upload: {"mode": "atomic" | "partial", "invoices": [...]}.
+        atomic  - nothing is saved unless every invoice is valid and created.
+        partial - valid invoices are saved in chunked transactions and each
+                  invoice reports its own result.
+        """
+        invoices = request.data.get('invoices')
+        mode = request.data.get('mode', 'atomic')
+        if not isinstance(invoices, list) or len(invoices) == 0:
+            return Response({"invoices": ["A non-empty list of invoices is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(invoices) > settings.SALES_INVOICE_BULK_MAX:
+            return Response({"invoices": [f"At most {settings.SALES_INVOICE_BULK_MAX} invoices per request."]}, status=status.HTTP_400_BAD_REQUEST)
+        if mode not in ('atomic', 'partial'):
+            return Response({"mode": ["Must be 'atomic' or 'partial'."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        products, customers = load_invoice_lookups(invoices)
+        results = [None] * len(invoices)
+        valid = []
+        for index, data in enumerate(invoices):
+            if not isinstance(data, dict):
+                results[index] = {"index": index, "status": "invalid", "errors": {"invoice": ["Invalid invoice format."]}}
+                continue
+            validator = InvoiceValidator(data, products=products, customers=customers)
+            if validator.is_valid():
+                valid.append(index)
+                results[index] = {"index": index, "status": "valid"}
+            else:
+                results[index] = {"index": index, "status": "invalid", "errors": validator.errors}
+
+        def create(index):
+            data = invoices[index]
+            invoice = create_invoice(customers[int(data['customer_id'])], data['items'], request.user, products=products)
+            results[index] = {"index": index, "status": "created", "id": invoice.id, "total_amount": str(invoice.total_amount)}
+
+        if mode == 'atomic':
+            if len(valid) != len(invoices):
+                return Response({"created": 0, "results": results}, status=status.HTTP_400_BAD_REQUEST)
+            current = None
+            try:
+                with transaction.atomic():
+                    for current in valid:
+                        create(current)
+            except Exception as e:
+                results = [{"index": index, "status": "rolled_back"} for index in valid]
+                results[valid.index(current)] = {"index": current, "status": "failed", "errors": {"error": [str(e)]}}
+                return Response({"created": 0, "results": results}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"created": len(valid), "results": results}, status=status.HTTP_201_CREATED)
+
+        chunk_size = settings.SALES_INVOICE_BULK_CHUNK_SIZE
+        for start in range(0, len(valid), chunk_size):
+            with transaction.atomic():
+                for index in valid[start:start + chunk_size]:
+                    try:
+                        with transaction.atomic():
+                            create(index)
+                    except Exception as e:
+                        results[index] = {"index": index, "status": "failed", "errors": {"error": [str(e)]}}
+
+        created = sum(1 for result in results if result["status"] == "created")
+        response_status = status.HTTP_201_CREATED if created == len(invoices) else status.HTTP_207_MULTI_STATUS
+        return Response({"created": created, "results": results}, status=response_status)
+
     def update(self, request, *args, **kwargs):
-        user = request.user
-        user_role_name = user.role.name.lower() if user.role else ""
+        user_role_name = get_auth_context(request).role_name
         
         # Check specific permission for changing status
         if 'status' in request.data:
@@ -206,3 +295,56 @@ class InvoiceViewSet(BaseSalesViewSet):
                     )
         
         return super().update(request, *args, **kwargs)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        before = invoice_snapshot(serializer.instance)
+        super().perform_update(serializer)
+        after = invoice_snapshot(serializer.instance)
+        if before != after:
+            lines = invoice_lines(serializer.instance)
+            record_invoice(before, lines, sign=-1)
+            record_invoice(after, lines)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        record_invoice(invoice_snapshot(instance), invoice_lines(instance), sign=-1)
+        super().perform_destroy(instance)
+
+
+class ReportViewSet(viewsets.ViewSet):
+    """
+    GET /reports/?group_by=date|status|role|customer|product&start=YYYY-MM-DD&end=YYYY-MM-DD[&status=]
+
+    Answered from the pre-aggregated summary tables. Non-admin users see what
+    the invoice list shows them: their own invoices and those of the roles
+    below theirs.
+    """
+    permission_classes = [DynamicHierarchicalPermission]
+    permission_model_name = 'Invoice'
+
+    def list(self, request):
+        group_by = request.query_params.get('group_by', 'date')
+        if group_by not in REPORT_GROUPINGS:
+            return Response({"group_by": [f"Must be one of: {', '.join(REPORT_GROUPINGS)}."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        dates = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            try:
+                dates[param] = parse_date(value) if value else None
+            except ValueError:
+                dates[param] = None
+            if value and dates[param] is None:
+                return Response({param: ["Use the YYYY-MM-DD format."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        context = get_auth_context(request)
+        role_ids = None
+        if not (user.is_superuser or context.is_admin):
+            role_ids = sorted(context.child_role_ids)
+
+        rows = sales_report(
+            group_by, role_ids=role_ids, user_id=user.pk, status=request.query_params.get('status'), **dates
+        )
+        return Response({"group_by": group_by, **dates, "results": rows})
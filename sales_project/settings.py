@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,7 @@ ROOT_URLCONF = 'sales_project.urls'
 
 
 MIDDLEWARE = [
+    'sales_app.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,13 +86,90 @@ WSGI_APPLICATION = 'sales_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
+# SALES_DB_ENGINE selects the profile: 'sqlite' (default) or 'postgres'.
+# sqlite reads SALES_SQLITE_PATH (default BASE_DIR / 'db.sqlite3').
+#
+# postgres reads POSTGRES_DB / POSTGRES_USER / POSTGRES_PASSWORD /
+# POSTGRES_HOST / POSTGRES_PORT and, by default, keeps a psycopg 3 connection
+# pool per process (pip install "psycopg[binary,pool]"), sized by
+# SALES_DB_POOL_MIN_SIZE / SALES_DB_POOL_MAX_SIZE. With SALES_DB_POOL=0 it
+# falls back to persistent connections kept for SALES_DB_CONN_MAX_AGE seconds.
+# Either way connections are health-checked before a request reuses them:
+# by the pool on checkout, or by CONN_HEALTH_CHECKS for persistent ones.
+SALES_DB_ENGINE = os.environ.get('SALES_DB_ENGINE', 'sqlite')
+
+if SALES_DB_ENGINE == 'postgres':
+    SALES_DB_POOL = os.environ.get('SALES_DB_POOL', '1') == '1'
+    if SALES_DB_POOL:
+        # only needed (and only installed) with the pool on
+        from psycopg_pool import ConnectionPool
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'sales'),
+            'USER': os.environ.get('POSTGRES_USER', 'sales'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # a pooled connection goes back to the pool after each request,
+            # so CONN_MAX_AGE must stay 0 when the pool is on
+            'CONN_MAX_AGE': 0 if SALES_DB_POOL else int(os.environ.get('SALES_DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('SALES_DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('SALES_DB_POOL_MAX_SIZE', '10')),
+                    'timeout': 10,
+                    # CONN_HEALTH_CHECKS does not apply to pooled connections
+                    'check': ConnectionPool.check_connection,
+                },
+            } if SALES_DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SALES_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+    # SALES_SQLITE_TUNED=1 is the supported mode for branch deployments:
+    # readers never block the writer (WAL), commits skip the per-transaction
+    # fsync (synchronous=NORMAL, still safe in WAL), writers wait for the lock
+    # instead of failing with "database is locked", and every transaction
+    # takes the write lock up front (BEGIN IMMEDIATE), so a read-then-write
+    # transaction such as create_invoice cannot fail on lock upgrade.
+    if os.environ.get('SALES_SQLITE_TUNED') == '1':
+        DATABASES['default']['OPTIONS'] = {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # busy_timeout, in seconds
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Holds the cached catalog pages. The version tokens that invalidate the
+# per-process caches (permission matrix, authenticated users, catalogs) are
+# kept in the database instead (sales_app.cache), so they are shared by every
+# worker whatever the backend; each worker re-reads a token at most every
+# SALES_VERSION_TOKEN_TTL seconds, the longest a revocation made on another
+# worker takes to apply.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+SALES_VERSION_TOKEN_TTL = 2
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -132,12 +211,28 @@ STATIC_URL = 'static/'
 #####################
 
 REST_FRAMEWORK = {
+    # simplejwt's JWTAuthentication, with the user and role served from a
+    # per-process cache (see SALES_AUTH_USER_CACHE_SIZE)
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'sales_app.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Keyset (cursor) pagination on (created_at, id); clients pass ?limit=
+    # (capped at KeysetPagination.max_page_size) and follow the `next` link.
+    'DEFAULT_PAGINATION_CLASS': 'sales_app.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # orjson when installed, DRF's json module otherwise; same bytes either way
+    'DEFAULT_RENDERER_CLASSES': (
+        'sales_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'sales_app.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 
@@ -163,6 +258,34 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+# Users (with their role) kept per process by CachedJWTAuthentication,
+# least recently used first out. Saving a User or Role invalidates its entry.
+SALES_AUTH_USER_CACHE_SIZE = 10000
+
+# Sign role id, child role ids and the permission bitmaps into access tokens so
+# permission checks and row scoping run without touching the database.
+# Tokens whose role_version no longer matches fall back to the database path.
+SALES_JWT_PERMISSION_CLAIMS = False
+
+# POST /api/invoices/bulk/ limits: invoices per request and invoices per
+# transaction in partial mode.
+SALES_INVOICE_BULK_MAX = 1000
+SALES_INVOICE_BULK_CHUNK_SIZE = 100
+
+# Shard count used by `manage.py compact_stock --shard/--hot` for best sellers
+# (see sales_app.stock). Roughly the number of concurrent tills selling them.
+SALES_STOCK_SHARDS = 8
+
+# Per-route request metrics, served at /metrics in the Prometheus text format.
+# Every request is counted; SALES_METRICS_SAMPLE_RATE of them are also timed
+# with their SQL (lower it in production to cut the overhead). Queries slower
+# than SALES_SLOW_QUERY_MS (None disables) are logged to 'sales_app.slow_queries'
+# with the route and the user's role. When SALES_METRICS_TOKEN is set, /metrics
+# requires "Authorization: Bearer <token>".
+SALES_METRICS_ENABLED = True
+SALES_METRICS_SAMPLE_RATE = float(os.environ.get('SALES_METRICS_SAMPLE_RATE', '1.0'))
+SALES_SLOW_QUERY_MS = 200
+SALES_METRICS_TOKEN = os.environ.get('SALES_METRICS_TOKEN')
 ################
 STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'